@@ -1,6 +1,19 @@
 # Author: Martin Matusiak <numerodix@gmail.com>
 # Licensed under the GNU Public License, version 3.
 
-from aspect import Aspect
-
 # This is the public API :-)
+
+from aspect import Aspect, load_table
+
+
+def install(spec, cache_dir=None, backend='compiler', lazy=False):
+    """Weave modules as they are imported, see importhook.install. The import
+    hook, and the weaving backends with it, are only loaded when it is
+    installed."""
+    import importhook
+    return importhook.install(spec, cache_dir=cache_dir, backend=backend,
+                              lazy=lazy)
+
+def uninstall(finder):
+    import importhook
+    importhook.uninstall(finder)
@@ -6,62 +6,143 @@ is the public API to define transformations in semantically meaningful ways.
 Worklists are used internally to aggregate advices from all the given aspects
 and provide methods for access and filtering."""
 
+import copy
+import csv
+import hashlib
+import json
 import os
+import sys
 
 import filepath
+import pointcut
 
 
-def hash_items(*args):
-    return reduce(long.__add__, map(long, map(hash, args)))
+class Object(object):
+    """Reference to an object injected by an advice. A null Object stands in
+    for an absent object (like a property without a setter). Objects have
+    value semantics on the original module name and object name, and are
+    interned, so that all advices injecting the same object share one
+    instance. Since they are shared, Objects are never changed: the name
+    their module goes by in a woven module is kept by the worklist."""
+    __slots__ = ('modulename', 'module', 'objname', 'file', '_hash')
 
+    interned = {}
+
+    @classmethod
+    def get(cls, obj):
+        """Return the interned Object for obj"""
+        key = None
+        if obj:
+            key = (obj.__module__, obj.__name__)
+        try:
+            return cls.interned[key]
+        except KeyError:
+            inst = cls.interned[key] = cls(obj)
+            return inst
 
-class Object(object):
     def __init__(self, obj):
+        self.modulename = self.module = self.objname = self.file = None
+        self._hash = 0
         if not obj:
-            self = None
             return
 
         self.modulename = obj.__module__    # original name
-        self.set_default_module_name()
+        self.module = self.modulename.split('.')[-1]    # default name
         self.objname = obj.__name__
+        self._hash = hash((self.modulename, self.objname))
 
         try:
-            path = filepath.try_import(module_name=self.modulename).__file__
+            self.file = filepath.find_module_file(self.modulename)
         except ImportError:
             raise   # XXX capitulate?
-        self.file = os.path.abspath(path)
 
-    def set_default_module_name(self):
-        module = '.'.join(self.modulename.split('.')[-1:])
-        self.module = module                # mangled name
+    def __nonzero__(self):
+        return self.objname is not None
+
+    def __eq__(self, other):
+        return (self is other or
+                (isinstance(other, Object) and
+                 self.modulename == other.modulename and
+                 self.objname == other.objname))
+
+    def __ne__(self, other):
+        return not self == other
 
     def __hash__(self):
-        try:
-            return hash_items(self.modulename, self.module, self.objname)
-        except AttributeError:
-            return 0
+        return self._hash
 
 
 class Advice(object):
+    """Advices have value semantics on their type, pattern and objects, and
+    are interned through intern(), so a repeated advice is only stored (and
+    woven) once."""
+    __slots__ = ('pattern', 'object', '_hash')
+
+    interned = {}
+
     def __init__(self, pattern, inj_obj):
         self.pattern = pattern
-        self.object = Object(inj_obj)
+        self.object = Object.get(inj_obj)
+        self._hash = None
+
+    def intern(self):
+        """Return the canonical instance of this advice"""
+        return Advice.interned.setdefault(self, self)
+
+    def __eq__(self, other):
+        return (self is other or
+                (self.__class__ is other.__class__ and
+                 self.pattern == other.pattern and
+                 tuple(self) == tuple(other)))
+
+    def __ne__(self, other):
+        return not self == other
 
     def __hash__(self):
         """Assist in duplicate detection"""
-        return hash_items(*tuple([self.pattern] + [obj for obj in self]))
+        if self._hash is None:
+            self._hash = hash((self.__class__, self.pattern) + tuple(self))
+        return self._hash
 
     def __iter__(self):
         return (obj for obj in (self.object,))
 
-class DecoratorAdvice(Advice): pass
-class MetaclassAdvice(Advice): pass
+class DecoratorAdvice(Advice):
+    __slots__ = ()
+
+class MetaclassAdvice(Advice):
+    __slots__ = ()
+
+class InlineAdvice(Advice):
+    """An advice whose function body is woven into the body of the matched
+    function, rather than wrapped around it"""
+    __slots__ = ()
+
+class BeforeAdvice(InlineAdvice):
+    __slots__ = ()
+
+class AfterAdvice(InlineAdvice):
+    __slots__ = ()
+
+class AroundAdvice(InlineAdvice):
+    __slots__ = ()
+
+class CallAdvice(Advice):
+    """An advice on the calls made in the matched code. Its pattern matches
+    the pathspec of the call site, module:Class/func->callee, where callee is
+    the dotted name called, and the call callee(args) becomes
+    advice(callee, args)."""
+    __slots__ = ()
+
 class PropertyAdvice(Advice):
+    __slots__ = ('fget', 'fset', 'fdel')
+
     def __init__(self, pattern, fget, fset, fdel):
         self.pattern = pattern
-        self.fget = Object(fget)
-        self.fset = Object(fset)
-        self.fdel = Object(fdel)
+        self.fget = Object.get(fget)
+        self.fset = Object.get(fset)
+        self.fdel = Object.get(fdel)
+        self._hash = None
 
     def __iter__(self):
         return (obj for obj in (self.fget, self.fset, self.fdel))
@@ -74,15 +155,86 @@ class Aspect(object):
 
     def add_decorator(self, pattern, obj):
         adv = DecoratorAdvice(pattern, obj)
-        self.worklist.append(adv)
+        self.worklist.append(adv.intern())
 
     def add_metaclass(self, pattern, obj):
         adv = MetaclassAdvice(pattern, obj)
-        self.worklist.append(adv)
+        self.worklist.append(adv.intern())
 
     def add_property(self, pattern, fget=None, fset=None, fdel=None):
         adv = PropertyAdvice(pattern, fget, fset, fdel)
-        self.worklist.append(adv)
+        self.worklist.append(adv.intern())
+
+    def add_before(self, pattern, obj):
+        """Weave the body of function obj in at the start of the matched
+        functions. The arguments of obj are those of a matched function by
+        the same name."""
+        adv = BeforeAdvice(pattern, obj)
+        self.worklist.append(adv.intern())
+
+    def add_after(self, pattern, obj):
+        """Weave the body of function obj in to run when the matched
+        functions return or raise, in a finally block"""
+        adv = AfterAdvice(pattern, obj)
+        self.worklist.append(adv.intern())
+
+    def add_around(self, pattern, obj):
+        """Weave the body of function obj in around the body of the matched
+        functions, which takes the place of a proceed() statement in obj"""
+        adv = AroundAdvice(pattern, obj)
+        self.worklist.append(adv.intern())
+
+    def add_call(self, pattern, obj):
+        """Intercept the calls the pattern matches, as in
+        'main:func->requests\\.get', with obj, which is passed the callee and
+        the arguments of the call"""
+        adv = CallAdvice(pattern, obj)
+        self.worklist.append(adv.intern())
+
+    def add_decorators(self, patterns, obj):
+        for pattern in patterns:
+            self.add_decorator(pattern, obj)
+
+    def add_metaclasses(self, patterns, obj):
+        for pattern in patterns:
+            self.add_metaclass(pattern, obj)
+
+    def add_properties(self, patterns, fget=None, fset=None, fdel=None):
+        for pattern in patterns:
+            self.add_property(pattern, fget, fset, fdel)
+
+    def add_rows(self, rows):
+        """Add advices from rows of (kind, pattern, object...), where the
+        objects are given by dotted name, like 'module.object'. A property
+        takes up to three objects (fget, fset, fdel), empty ones are None."""
+        resolve = ObjectResolver()
+        for row in rows:
+            if not row or row[0].startswith('#'):
+                continue
+            if len(row) < 2:
+                raise ValueError("Bad row %r, expected kind,pattern,object"
+                                 % (row,))
+            (kind, pattern) = row[:2]
+            try:
+                objs = [resolve(name) for name in row[2:]]
+            except ValueError as e:
+                raise ValueError("Bad row %r: %s" % (row, e))
+            if kind == 'decorator':
+                self.add_decorator(pattern, *objs)
+            elif kind == 'metaclass':
+                self.add_metaclass(pattern, *objs)
+            elif kind == 'property':
+                self.add_property(pattern, *objs)
+            elif kind == 'before':
+                self.add_before(pattern, *objs)
+            elif kind == 'after':
+                self.add_after(pattern, *objs)
+            elif kind == 'around':
+                self.add_around(pattern, *objs)
+            elif kind == 'call':
+                self.add_call(pattern, *objs)
+            else:
+                raise ValueError("Unknown kind of advice: %s" % kind)
 
     @classmethod
     def iter(cls, *aspects):
@@ -92,86 +244,185 @@ class Aspect(object):
             for advice in aspect.worklist:
                 yield advice
 
+
+class ObjectResolver(object):
+    """Resolve objects by dotted name, importing each module once"""
+    def __init__(self):
+        self.objects = {}
+
+    def __call__(self, name):
+        if not name:
+            return None
+        try:
+            return self.objects[name]
+        except KeyError:
+            if '.' not in name:
+                raise ValueError("Cannot resolve object %r, expected "
+                                 "module.object" % name)
+            (modulename, objname) = name.rsplit('.', 1)
+            __import__(modulename)
+            obj = getattr(sys.modules[modulename], objname)
+            self.objects[name] = obj
+            return obj
+
+
+def load_table(file):
+    """Load an aspect from a table of advices, either a csv file or a json
+    list, with rows of the form accepted by Aspect.add_rows:
+
+    decorator,main:func,myaspects.dec
+    property,main:Obj/att,myaspects.get,myaspects.set,
+    """
+    path = os.path.dirname(os.path.abspath(file))
+    if path not in sys.path:
+        sys.path.append(path)
+
+    aspect = Aspect()
+    if os.path.splitext(file)[1] == '.json':
+        aspect.add_rows(json.load(open(file)))
+    else:
+        aspect.add_rows(csv.reader(open(file)))
+    return aspect
+
+
+class Worklist(object):
+    """A collection of advices, indexed when it is built: advices are
+    bucketed by type, and the patterns of each bucket are compiled into a
+    matcher (which also indexes them by module) the first time it is used.
+    The advices are never changed after that; mangle() returns a copy."""
+
+    KINDS = (DecoratorAdvice, MetaclassAdvice, PropertyAdvice, InlineAdvice,
+             CallAdvice)
+
+    def __init__(self, *aspects):
+        self.build(Aspect.iter(*aspects))
+
     @classmethod
-    def join(cls, *aspects):
-        """Aggregate advices and filter out duplicates (order preserving)."""
+    def from_advices(cls, advices):
+        worklist = cls.__new__(cls)
+        worklist.build(advices)
+        return worklist
+
+    def build(self, advices):
+        """Filter out duplicate advices (order preserving) and index the
+        rest."""
         seen = {}
         items = []
-        for item in cls.iter(*aspects):
+        for item in advices:
             if item not in seen:
                 items.append(item)
                 seen[item] = None
-        return items
-
-
-class Worklist(object):
-    def __init__(self, *aspects):
-        self.advices = Aspect.join(*aspects)
-
-    def append(self, advice):
-        self.advices.append(advice)
+        self.advices = tuple(items)
+        self.buckets = {Advice: self.advices}
+        for kind in self.KINDS:
+            self.buckets[kind] = tuple([adv for adv in self.advices
+                                        if isinstance(adv, kind)])
+        self.objects = tuple([obj for adv in self.advices
+                              for obj in adv if obj])
+        self.matchers = {}
+        self.modules = None
+        self.names = {}
+
+    def subset(self, advices):
+        """A worklist of some of the advices of this one, with its module
+        names"""
+        worklist = Worklist.from_advices(advices)
+        worklist.names = self.names
+        return worklist
 
     def __len__(self):
         """Allow instances to be used as checks in if statements based on the
         length of the container."""
         return len(self.advices)
 
+    def __iter__(self):
+        return iter(self.advices)
+
 
     def get_module_paths(self):
-        objs = []
-        for adv in self.advices:
-            for obj in adv:
-                file = getattr(obj, 'file', None)
-                if file:
-                    m = filepath.Module()
-                    m.file = file
-                    # appears completely broken
-                    #path = os.sep.join(m.file_path.split(os.sep)[:-1]) # XXX ??
-                    path = m.file_path
-                    objs.append(path)
-        return list(set([obj for obj in objs]))
+        return list(set([os.path.dirname(obj.file) for obj in self.objects]))
 
     def get_modules(self):
-        objs = []
-        for adv in self.advices:
-            for obj in adv:
-                if hasattr(obj, 'module'):
-                    objs.append(obj)
-        return list(set([(obj.modulename, obj.module) for obj in objs]))
+        """The modules to import, as (original name, mangled name) pairs"""
+        if self.modules is None:
+            self.modules = list(set([(obj.modulename,
+                                      self.get_module_name(obj))
+                                     for obj in self.objects]))
+        return self.modules
+
+    def get_module_name(self, obj):
+        """The name the module of an object goes by in a woven module"""
+        return self.names.get(obj.modulename, obj.module)
 
     def get_decorators(self):
-        return [adv for adv in self.advices if isinstance(adv, DecoratorAdvice)]
+        return self.buckets[DecoratorAdvice]
 
     def get_metaclasses(self):
-        return [adv for adv in self.advices if isinstance(adv, MetaclassAdvice)]
+        return self.buckets[MetaclassAdvice]
 
     def get_properties(self):
-        return [adv for adv in self.advices if isinstance(adv, PropertyAdvice)]
-
-
-    def mangle_modulenames(self, namelist):
-        # find non null objects
-        objs = []
-        for advice in self.advices:
-            for obj in advice:
-                if hash(obj) != 0:
-                    objs.append(obj)
-
-        # hash by file,modulename to group by distinct files
-        index = {}
-        for obj in objs:
-            index[obj.file + obj.modulename] = obj.module
-
-        # mangle to produce uniques
-        for e in index:
-            while True:
-                if index[e] in namelist:
-                    index[e] = index[e] + '_'
-                else:
-                    namelist.append(index[e])
-                    break
-
-        # assign mangled names
-        for obj in objs:
-            obj.module = index[obj.file + obj.modulename]
+        return self.buckets[PropertyAdvice]
+
+    def get_inlines(self):
+        return self.buckets[InlineAdvice]
+
+    def get_calls(self):
+        return self.buckets[CallAdvice]
+
 
+    def get_matcher(self, cls):
+        """The patterns of each advice type are compiled into a matcher the
+        first time the type is used."""
+        matcher = self.matchers.get(cls)
+        if matcher is None:
+            matcher = self.matchers[cls] = pointcut.Matcher(self.buckets[cls])
+        return matcher
+
+    def match(self, cls, pathspec, stats=None):
+        """Find the advices of type cls that match the pathspec."""
+        return self.get_matcher(cls).match(pathspec, stats=stats)
+
+    def may_match_module(self, local_name):
+        """Whether any advice could apply to the module, so that modules that
+        cannot match need not be parsed."""
+        return self.get_matcher(Advice).matches_module(local_name)
+
+
+    def fingerprint(self, *files):
+        """Digest of everything that determines the result of a weave: the
+        advices, their (mangled) module names, the sources of the modules they
+        come from and any additional files (like the spec)."""
+        digest = hashlib.sha1()
+        for adv in self.advices:
+            digest.update('%s %s\n' % (adv.__class__.__name__, adv.pattern))
+            for obj in adv:
+                if obj:
+                    digest.update('%s %s %s\n' %
+                                  (obj.modulename, self.get_module_name(obj),
+                                   obj.objname))
+                    files += (obj.file,)
+        for file in sorted(set(files)):
+            file = filepath.get_source_file(file)
+            digest.update('%s %s\n' % (file, filepath.hash_file(file)))
+        return digest.hexdigest()
+
+    def mangle(self, namelist):
+        """Return a copy of the worklist in which the advice modules are
+        renamed so they do not clash with the names in namelist, or with
+        each other. The worklist itself is left as it is, so it can be
+        mangled for one module after another."""
+        namelist = set(namelist)
+        names = {}
+        for obj in sorted(self.objects, key=lambda obj: obj.modulename):
+            if obj.modulename in names:
+                continue
+            name = obj.module
+            while name in namelist:
+                name += '_'
+            namelist.add(name)
+            names[obj.modulename] = name
+
+        worklist = copy.copy(self)
+        worklist.names = names
+        worklist.modules = None
+        return worklist
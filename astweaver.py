@@ -0,0 +1,710 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""A weaving backend on the ast module, in place of the compiler package.
+Modules are parsed with ast.parse and compiled with the builtin compile(),
+both implemented in C. The transformations are those of the compiler backend
+(visitors.TransformerVisitor): decorators, metaclasses and properties, on the
+same pathspecs, with the same imports injected into the module. AstModule has
+the interface of ModuleCompiler, so the two can be used interchangeably."""
+
+import ast
+import copy
+import os
+import sys
+
+from bootstrap import get_canonical_names
+from log import logger, TRACE
+from stats import NULL_STATS
+import aspect
+import bytecode
+import filepath
+
+
+PY3 = sys.version_info[0] >= 3
+
+FUNCTIONS = (ast.FunctionDef, )
+if hasattr(ast, 'AsyncFunctionDef'):
+    FUNCTIONS += (ast.AsyncFunctionDef, )
+
+if PY3:
+    import builtins
+    import importlib.util
+    BUILTINS = frozenset(dir(builtins))
+else:
+    import __builtin__
+    BUILTINS = frozenset(dir(__builtin__))
+
+
+def get_argname(arg):
+    """The name of a function argument, a Name in python 2"""
+    return getattr(arg, 'arg', None) or getattr(arg, 'id', None)
+
+def get_argnames(args):
+    """The names of all the arguments of a function, with the tuple arguments
+    of python 2 unpacked"""
+    names = []
+    for arg in (getattr(args, 'posonlyargs', []) + args.args +
+                getattr(args, 'kwonlyargs', [])):
+        if isinstance(arg, ast.Tuple):
+            names.extend([node.id for node in ast.walk(arg)
+                          if isinstance(node, ast.Name)])
+        else:
+            names.append(get_argname(arg))
+    for arg in (args.vararg, args.kwarg):
+        if arg:
+            names.append(getattr(arg, 'arg', arg))
+    return names
+
+def get_dotted_name(node):
+    """The dotted name of a Name, or of a chain of Attribute on one, else
+    None"""
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute):
+        name = get_dotted_name(node.value)
+        return name and name + '.' + node.attr
+
+def get_dotted(dotted):
+    """An expression node for a dotted name, like module.object"""
+    items = dotted.split('.')
+    node = ast.Name(items[0], ast.Load())
+    for item in items[1:]:
+        node = ast.Attribute(node, item, ast.Load())
+    return node
+
+def make_str(s):
+    if PY3:
+        return ast.Constant(s)
+    return ast.Str(s)
+
+def is_str(node):
+    if PY3:
+        return isinstance(node, ast.Constant) and isinstance(node.value, str)
+    return isinstance(node, ast.Str)
+
+def make_call(func, args=(), keywords=()):
+    call = ast.Call(func=func, args=list(args), keywords=list(keywords))
+    if not PY3:
+        call.starargs = call.kwargs = None
+    return call
+
+def locate(node, ref):
+    """Give an injected node, and the nodes under it, the location of ref"""
+    for child in ast.walk(node):
+        ast.copy_location(child, ref)
+    return node
+
+def has_docstring(body):
+    return bool(body and isinstance(body[0], ast.Expr) and
+                is_str(body[0].value))
+
+def get_path_check(path):
+    """if path not in __import__('sys').path:
+           __import__('sys').path.append(path)"""
+    def sys_path():
+        sys = make_call(ast.Name('__import__', ast.Load()), [make_str('sys')])
+        return ast.Attribute(sys, 'path', ast.Load())
+    compare = ast.Compare(make_str(path), [ast.NotIn()], [sys_path()])
+    append = make_call(ast.Attribute(sys_path(), 'append', ast.Load()),
+                       [make_str(path)])
+    return ast.If(compare, [ast.Expr(append)], [])
+
+def make_try_finally(body, finalbody):
+    if PY3:
+        return ast.Try(body=body, handlers=[], orelse=[], finalbody=finalbody)
+    return ast.TryFinally(body, finalbody)
+
+
+class NameFinder(ast.NodeVisitor):
+    """Collect the names that would clash with the modules a transformation
+    imports into the module, for both backends. Injected references are
+    evaluated at module level and at class level, but also within functions:
+    the decorators of nested functions, the bodies of inline advices and
+    intercepted calls. So the names bound in every scope are collected, the
+    arguments of functions and lambdas included, as well as names declared
+    global. Uses of builtins are collected too, an import must not hide them
+    either."""
+    def __init__(self):
+        self.names = set()
+
+    def get_names(self):
+        return self.names
+
+    def visit_Name(self, node):
+        if not isinstance(node.ctx, ast.Load) or node.id in BUILTINS:
+            self.names.add(node.id)
+
+    def visit_ClassDef(self, node):
+        self.names.add(node.name)
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        self.names.add(node.name)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_arguments(self, node):
+        self.names.update(get_argnames(node))
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        if isinstance(node.name, str):
+            self.names.add(node.name)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.names.add(alias.asname or alias.name.split('.')[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name != '*':
+                self.names.add(alias.asname or alias.name)
+
+    def visit_Global(self, node):
+        self.names.update(node.names)
+
+
+class InlineBody(object):
+    """The body of the function of an inline advice, to be spliced into
+    matched functions, like visitors.InlineBody."""
+
+    DISALLOWED = tuple([getattr(ast, name) for name in
+                        ('Return', 'Yield', 'YieldFrom', 'Await', 'FunctionDef',
+                         'AsyncFunctionDef', 'Lambda', 'ClassDef', 'Global',
+                         'Nonlocal', 'Import', 'ImportFrom')
+                        if hasattr(ast, name)])
+
+    # source file of an advice module -> tree
+    trees = {}
+
+    def __init__(self, advice):
+        obj = advice.object
+        self.advice = advice
+        self.name = '%s.%s' % (obj.modulename, obj.objname)
+        self.prefix = '_aopy_%s_%s_' % (obj.modulename.replace('.', '_'),
+                                        obj.objname)
+
+        file = filepath.get_source_file(obj.file)
+        tree = self.trees.get(file)
+        if tree is None:
+            tree = self.trees[file] = ast.parse(open(file).read(), file)
+        funcs = [node for node in tree.body
+                 if isinstance(node, ast.FunctionDef) and node.name == obj.objname]
+        if not funcs:
+            raise ValueError("Inline advice %s is not a function defined at "
+                             "module level" % self.name)
+        func = funcs[-1]
+
+        self.argnames = get_argnames(func.args)
+        self.locals = set()
+        body = func.body[has_docstring(func.body) and 1 or 0:]
+        for stmt in body:
+            for node in ast.walk(stmt):
+                if isinstance(node, self.DISALLOWED):
+                    raise ValueError("Inline advice %s cannot contain %s" %
+                                     (self.name, node.__class__.__name__))
+                if (isinstance(node, ast.Name) and
+                    isinstance(node.ctx, (ast.Store, ast.Del))):
+                    self.locals.add(node.id)
+                elif (isinstance(node, ast.ExceptHandler) and
+                      isinstance(node.name, str)):
+                    self.locals.add(node.name)
+        self.locals.difference_update(self.argnames)
+
+        self.before = body
+        self.after = []
+        if isinstance(advice, aspect.AfterAdvice):
+            (self.before, self.after) = (self.after, self.before)
+        elif isinstance(advice, aspect.AroundAdvice):
+            proceeds = [i for (i, node) in enumerate(self.before)
+                        if self.is_proceed(node)]
+            if len(proceeds) != 1:
+                raise ValueError("Inline advice %s must have one proceed() "
+                                 "statement in its body" % self.name)
+            (i, ) = proceeds
+            (self.before, self.after) = (self.before[:i], self.before[i+1:])
+            for stmt in self.before + self.after:
+                for node in ast.walk(stmt):
+                    if isinstance(node, ast.Name) and node.id == 'proceed':
+                        raise ValueError("Inline advice %s can only use "
+                                         "proceed() as a statement in its "
+                                         "body" % self.name)
+
+        self.globals = set()
+        for stmt in self.before + self.after:
+            for node in ast.walk(stmt):
+                if (isinstance(node, ast.Name) and
+                    node.id not in self.locals and
+                    node.id not in self.argnames and
+                    node.id not in BUILTINS):
+                    self.globals.add(node.id)
+
+    def is_proceed(self, node):
+        return (isinstance(node, ast.Expr) and
+                isinstance(node.value, ast.Call) and
+                isinstance(node.value.func, ast.Name) and
+                node.value.func.id == 'proceed' and
+                not (node.value.args or node.value.keywords or
+                     getattr(node.value, 'starargs', None) or
+                     getattr(node.value, 'kwargs', None)))
+
+    def splice(self, func, module):
+        """Splice the advice into func, return the statements spliced in.
+        module is the dotted name of the advice's module, which the globals
+        of the advice are looked up on."""
+        argnames = set(get_argnames(func.args))
+        missing = [name for name in self.argnames if name not in argnames]
+        if missing:
+            raise ValueError("Inline advice %s takes arguments that %s does "
+                             "not have: %s" %
+                             (self.name, func.name, ', '.join(missing)))
+
+        renamer = InlineRenamer(self, module)
+        before = [locate(renamer.visit(st), func)
+                  for st in copy.deepcopy(self.before)]
+        after = [locate(renamer.visit(st), func)
+                 for st in copy.deepcopy(self.after)]
+        i = has_docstring(func.body) and 1 or 0
+        stmts = func.body[i:]
+        if after and stmts:
+            stmts = [locate(make_try_finally(stmts, after), func)]
+        elif after:
+            stmts = after
+        func.body = func.body[:i] + before + stmts
+        return before + after
+
+
+class InlineRenamer(ast.NodeTransformer):
+    """Rename the locals of an inline body, and look its globals up on its
+    module"""
+    def __init__(self, body, module):
+        self.body = body
+        self.module = module
+
+    def visit_Name(self, node):
+        if node.id in self.body.locals:
+            node.id = self.body.prefix + node.id
+        elif node.id in self.body.globals:
+            node = ast.Attribute(get_dotted(self.module), node.id, node.ctx)
+        return node
+
+    def visit_ExceptHandler(self, node):
+        if isinstance(node.name, str) and node.name in self.body.locals:
+            node.name = self.body.prefix + node.name
+        self.generic_visit(node)
+        return node
+
+
+class ClassIndex(object):
+    """Index the members of a class body, like visitors.ClassIndex"""
+
+    WRAPPERS = ('classmethod', 'staticmethod')
+
+    def __init__(self, cls):
+        assert isinstance(cls, ast.ClassDef)
+        self.methods = []
+        self.wrapped = set()
+        self.attributes = []
+
+        for node in cls.body:
+            if isinstance(node, FUNCTIONS):
+                self.methods.append(node)
+                for dec in node.decorator_list:
+                    if self.is_wrapper(dec):
+                        self.wrapped.add(node.name)
+            elif isinstance(node, ast.Assign):
+                if (isinstance(node.value, ast.Call) and
+                    self.is_wrapper(node.value.func)):
+                    for target in node.targets:
+                        if isinstance(target, ast.Name):
+                            self.wrapped.add(target.id)
+
+        seen = set()
+        for f in self.methods:
+            if not self.is_instancemethod(f.name) or not f.args.args:
+                continue
+            self_name = get_argname(f.args.args[0])
+            for ass in f.body:
+                if not isinstance(ass, ast.Assign):
+                    continue
+                for target in ass.targets:
+                    if (isinstance(target, ast.Attribute) and
+                        isinstance(target.value, ast.Name) and
+                        target.value.id == self_name and
+                        target.attr not in seen):
+                        seen.add(target.attr)
+                        self.attributes.append(target.attr)
+
+    def is_wrapper(self, node):
+        return isinstance(node, ast.Name) and node.id in self.WRAPPERS
+
+    def is_instancemethod(self, f_name):
+        return f_name not in self.wrapped
+
+
+class Transformer(object):
+    """Match advice patterns against the pathspecs of classes and functions
+    and transform them in a single walk of the tree, then inject the imports
+    of the matched advices, like visitors.TransformerVisitor. Classes and
+    functions can only be defined by statements, so the walk only descends
+    into the statement lists of the tree, not into expressions. Only if
+    there are call advices are the expressions of each statement searched
+    for calls."""
+
+    BODIES = ('body', 'orelse', 'handlers', 'finalbody', 'cases')
+
+    def __init__(self, localname, worklist, stats=None, bootstrap=None):
+        self.localname = localname
+        self.worklist = worklist
+        self.bootstrap = bootstrap
+        self.helpers = set()
+        self.imported = set()
+        self.inlines = {}
+        self.injected = set()
+        self.calls = bool(worklist.get_calls())
+        self.matched_advices = []
+        self.stats = stats
+        self.nodes = 0
+        self.trace = logger.isEnabledFor(TRACE)
+
+    def transform(self, tree):
+        """Transform the module, return True if any advice matched"""
+        self.walk(tree, None)
+        if self.matched_advices:
+            matched = self.worklist.subset(self.matched_advices)
+            mods = matched.get_modules()
+            if self.bootstrap:
+                self.add_bootstrap_import(tree, mods)
+            else:
+                paths = matched.get_module_paths()
+                self.add_imports(tree, paths, mods)
+            return True
+
+    def walk(self, node, pathspec):
+        """Visit the statements under node, pathspec is that of the innermost
+        class or function around them, if any"""
+        for field in self.BODIES:
+            children = getattr(node, field, None)
+            if not isinstance(children, list):
+                continue                # like the body of exec
+            for child in children:
+                self.nodes += 1
+                if isinstance(child, ast.ClassDef):
+                    self.visit_class(child, self.get_pathspec(child, pathspec))
+                elif isinstance(child, FUNCTIONS):
+                    self.visit_function(child, self.get_pathspec(child, pathspec))
+                else:
+                    if self.calls:
+                        self.visit_calls(child, pathspec)
+                    self.walk(child, pathspec)
+
+    def get_pathspec(self, node, outer):
+        if outer:
+            return outer + '/' + node.name
+        return self.localname + ':' + node.name
+
+
+    ## Visit methods
+
+    def match(self, cls, pathspec):
+        advices = self.worklist.match(cls, pathspec, stats=self.stats)
+        for advice in advices:
+            if self.trace:
+                logger.debug("Pattern matched: %s on %s", advice.pattern, pathspec)
+            self.matched_advices.append(advice)
+        return advices
+
+    def visit_calls(self, node, pathspec):
+        """Visit the calls in the expressions of a statement, but not in the
+        statements under it"""
+        calls = []
+        for (field, value) in ast.iter_fields(node):
+            if field in self.BODIES and isinstance(value, list):
+                continue
+            if not isinstance(value, list):
+                value = [value]
+            for expr in value:
+                if isinstance(expr, ast.AST):
+                    calls.extend([sub for sub in ast.walk(expr)
+                                  if isinstance(sub, ast.Call)])
+        for call in calls:
+            if call in self.injected:
+                continue
+            callee = get_dotted_name(call.func)
+            if callee:
+                callspec = (pathspec or self.localname + ':') + '->' + callee
+                for advice in self.match(aspect.CallAdvice, callspec):
+                    self.intercept_call(call, advice)
+
+    def visit_class(self, node, pathspec):
+        if self.calls:
+            self.visit_calls(node, pathspec)
+        for advice in self.match(aspect.MetaclassAdvice, pathspec):
+            self.set_metaclass(node, advice)
+
+        if self.worklist.get_properties():
+            for name in ClassIndex(node).attributes:
+                attrspec = pathspec + '/' + name
+                for advice in self.match(aspect.PropertyAdvice, attrspec):
+                    self.set_property(node, name, advice)
+        self.walk(node, pathspec)
+
+    def visit_function(self, node, pathspec):
+        if self.calls:
+            self.visit_calls(node, pathspec)
+        for advice in self.match(aspect.InlineAdvice, pathspec):
+            self.add_inline(node, advice)
+        for advice in self.match(aspect.DecoratorAdvice, pathspec):
+            self.add_decorator(node, advice)
+        self.walk(node, pathspec)
+
+
+    ## Construction methods
+
+    def inject(self, node):
+        """Record the calls in a node the weaver adds, which call advice
+        leaves alone, return the node"""
+        self.injected.update([sub for sub in ast.walk(node)
+                              if isinstance(sub, ast.Call)])
+        return node
+
+    def get_reference(self, obj, kind):
+        """A reference to an injected object through its module, or in lazy
+        mode, through the helper for its kind of reference"""
+        if self.bootstrap and self.bootstrap.lazy:
+            (helper, alias) = self.bootstrap.get_helper(kind)
+            self.helpers.add((helper, alias))
+            args = [make_str(obj.modulename), make_str(obj.objname)]
+            return self.inject(make_call(ast.Name(alias, ast.Load()), args))
+        module = self.worklist.get_module_name(obj)
+        return get_dotted('%s.%s' % (module, obj.objname))
+
+
+    ## Mutation methods
+
+    def get_header_end(self, module):
+        """Where to inject statements: after the docstring and any future
+        imports"""
+        body = module.body
+        i = has_docstring(body) and 1 or 0
+        while (i < len(body) and isinstance(body[i], ast.ImportFrom) and
+               body[i].module == '__future__'):
+            i += 1
+        return i
+
+    def add_bootstrap_import(self, module, mods):
+        """from _aopy_bootstrap import canonical as mangled, ...
+
+        preceded, unless the bootstrap is in memory, by (binding no names):
+
+        if path not in __import__('sys').path:
+            __import__('sys').path.append(path)
+        """
+        assert isinstance(module, ast.Module)
+        stmts = []
+        if self.bootstrap.lazy:
+            names = [ast.alias(helper, alias)
+                     for (helper, alias) in sorted(self.helpers)]
+            (_, importer) = self.bootstrap.get_importer()
+            for (name, mangled) in sorted(self.imported):
+                call = make_call(ast.Name(importer, ast.Load()), [make_str(name)])
+                stmts.append(ast.Assign([ast.Name(mangled, ast.Store())], call))
+        else:
+            canon = get_canonical_names([name for (name, _) in
+                                         self.worklist.get_modules()])
+            names = [ast.alias(canon[name], mangled)
+                     for (name, mangled) in sorted(mods)]
+        if names:
+            stmts.insert(0, ast.ImportFrom(self.bootstrap.name, names, 0))
+        if stmts and self.bootstrap.path:
+            stmts.insert(0, get_path_check(self.bootstrap.path))
+        i = self.get_header_end(module)
+        module.body[i:i] = [locate(st, module.body[i]) for st in stmts]
+
+    def add_imports(self, module, paths, mods):
+        """Inject, after the docstring and any future imports:
+
+        import sys
+        for path in paths:
+            if path not in sys.path:
+                sys.path.append(path)
+        import modulename as module
+        """
+        assert isinstance(module, ast.Module)
+        body = module.body
+        i = self.get_header_end(module)
+
+        stmts = [ast.Import([ast.alias('sys', None)])]
+        call = make_call(get_dotted('sys.path.append'),
+                         [ast.Name('path', ast.Load())])
+        compare = ast.Compare(ast.Name('path', ast.Load()), [ast.NotIn()],
+                              [get_dotted('sys.path')])
+        if_node = ast.If(compare, [ast.Expr(call)], [])
+        paths_node = ast.Tuple([make_str(path) for path in paths], ast.Load())
+        stmts.append(ast.For(ast.Name('path', ast.Store()), paths_node,
+                             [if_node], []))
+        for (name, asname) in reversed(mods):
+            stmts.append(ast.Import([ast.alias(name, asname)]))
+        body[i:i] = [locate(st, body[i]) for st in stmts]
+
+    def add_decorator(self, func, dec_advice):
+        'Wraps decorator around existing (decs+func)'
+        assert isinstance(dec_advice, aspect.DecoratorAdvice)
+        dec = locate(self.get_reference(dec_advice.object, 'decorator'), func)
+        func.decorator_list.insert(0, dec)
+
+    def add_inline(self, func, inline_advice):
+        'Splices the advice into the body of func'
+        assert isinstance(inline_advice, aspect.InlineAdvice)
+        body = self.inlines.get(inline_advice)
+        if body is None:
+            body = self.inlines[inline_advice] = InlineBody(inline_advice)
+        obj = inline_advice.object
+        module = self.worklist.get_module_name(obj)
+        if body.globals and self.bootstrap and self.bootstrap.lazy:
+            # imported with the module, not on first use
+            self.helpers.add(self.bootstrap.get_importer())
+            self.imported.add((obj.modulename, module))
+        for st in body.splice(func, module):
+            self.inject(st)
+
+    def intercept_call(self, call, call_advice):
+        'Calls the advice in place of the callee, passing it the callee'
+        assert isinstance(call_advice, aspect.CallAdvice)
+        ref = locate(self.get_reference(call_advice.object, 'function'), call)
+        call.args.insert(0, call.func)
+        call.func = ref
+
+    def set_metaclass(self, cl, meta_advice):
+        'Overrides existing metaclass if set'
+        assert isinstance(meta_advice, aspect.MetaclassAdvice)
+        metaval = self.get_reference(meta_advice.object, 'metaclass')
+        if PY3:
+            cl.keywords = [kw for kw in cl.keywords if kw.arg != 'metaclass']
+            cl.keywords.append(locate(ast.keyword('metaclass', metaval), cl))
+            return
+
+        # kill existing metaclass
+        stmts = [st for st in cl.body
+                 if not (isinstance(st, ast.Assign) and
+                         isinstance(st.targets[0], ast.Name) and
+                         st.targets[0].id == '__metaclass__')]
+
+        metakey = ast.Name('__metaclass__', ast.Store())
+        metast = locate(ast.Assign([metakey], metaval), cl)
+        stmts.insert(has_docstring(stmts) and 1 or 0, metast)
+        cl.body = stmts
+
+    def set_property(self, cl, name, advice):
+        # kill existing property on this name
+        stmts = [st for st in cl.body
+                 if not (isinstance(st, ast.Assign) and
+                         [t for t in st.targets
+                          if isinstance(t, ast.Name) and t.id == name])]
+
+        keywords = []
+        for f_label in ('fget', 'fset', 'fdel'):
+            obj = getattr(advice, f_label)
+            if obj:
+                keywords.append(ast.keyword(f_label,
+                                            self.get_reference(obj, 'function')))
+
+        call = self.inject(make_call(ast.Name('property', ast.Load()),
+                                     keywords=keywords))
+        metast = ast.Assign([ast.Name(name, ast.Store())], call)
+        stmts.append(locate(metast, cl))
+        cl.body = stmts
+
+
+class AstModule(filepath.Module):
+    """A module woven with the ast backend, with the interface of
+    ModuleCompiler. Parsing with ast is fast enough that trees are not
+    cached, the cache argument is accepted for the interface only and
+    ignored (aopyc rejects -p with this backend)."""
+    def __init__(self, filename, basepath=None, cache=None, stats=NULL_STATS):
+        self.file = filename
+        self.tree = None
+        self.code = None
+        self.stats = stats
+
+        if basepath:
+            base = os.path.commonprefix([self.file_path, basepath])
+            localfile = self.file[1+len(base):]
+            (self.local_name, _) = os.path.splitext(localfile)
+
+    def get_tree(self):
+        """Parse on demand"""
+        if not self._tree:
+            self.parse()
+        return self._tree
+
+    def set_tree(self, tree):
+        self._tree = tree
+
+    tree = property(fget=get_tree, fset=set_tree)
+
+    def get_pycfile(self):
+        """Python 3 only reads bytecode from __pycache__ when there is a
+        source file"""
+        if PY3:
+            return importlib.util.cache_from_source(self.file)
+        return filepath.Module.get_pycfile(self)
+
+    pycfile = property(fget=get_pycfile)
+
+    def parse(self):
+        source = open(self.file).read()
+        with self.stats.timer('parse', self.file):
+            self.tree = ast.parse(source, self.file)
+
+    def release(self):
+        """Drop the tree and the code, the tree is parsed again on demand"""
+        self.tree = None
+        self.code = None
+
+    def display(self):
+        print(ast.dump(self.tree))
+
+
+    def find_names(self):
+        tree = self.tree        # parsed on demand, timed on its own
+        with self.stats.timer('names', self.file):
+            namefinder = NameFinder()
+            namefinder.visit(tree)
+        return namefinder.get_names()
+
+    def may_match(self, worklist):
+        """Rule out modules no advice can apply to, without parsing"""
+        return worklist.may_match_module(self.local_name)
+
+    def transform(self, worklist, bootstrap=None):
+        if not self.may_match(worklist):
+            return
+
+        logger.debug("Transforming module %s", self.file)
+        tree = self.tree
+        transformer = Transformer(self.local_name, worklist, stats=self.stats,
+                                  bootstrap=bootstrap)
+        with self.stats.timer('transform', self.file):
+            matched = transformer.transform(tree)
+        self.stats.count(self.file, 'nodes', transformer.nodes)
+        if matched:
+            logger.info("Woven module %s", self.file)
+            return True
+
+    def compile(self, display=False):
+        if display:
+            self.display()
+        tree = self.tree
+        with self.stats.timer('compile', self.file):
+            self.code = compile(tree, self.file, 'exec')
+
+    def writepyc(self, verbose=False, invalidation=bytecode.TIMESTAMP):
+        self.compile(display=verbose)
+        with self.stats.timer('dump', self.file):
+            size = bytecode.write(self.pycfile, self.code, self.file,
+                                  mode=invalidation)
+        self.stats.count(self.file, 'bytes', size)
@@ -0,0 +1,188 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""The bootstrap module sets up the paths of the advice modules and imports
+them, once, for a whole woven tree. It is generated by the compiler and
+written as bytecode only (_aopy_bootstrap_<hash>.pyc) at the root of the tree,
+or registered in memory by the import hook. Each tree, and each worklist the
+import hook is installed with, gets a bootstrap of its own, named by a hash of
+the root or of the worklist's fingerprint, so that separately woven trees can
+be imported in one program. Woven modules then only need one statement to get
+at the advice modules, after putting the root of the tree on the path, in case
+the program is started from a subdirectory:
+
+from _aopy_bootstrap_0123abcd import myaspects as myaspects_
+
+In the bootstrap the modules go by a canonical name, the dotted name with
+underscores, and in a woven module by the name mangled to fit that module.
+
+In lazy mode the bootstrap imports nothing. Woven modules instead get
+references that import the advice module on first use. A decorator is applied
+when the function is first called, and a module level function is then
+replaced by the decorated one. Anything but a plain function, like a
+classmethod, is decorated right away, since a wrapper would lose its binding.
+A metaclass is resolved when the class is created, and the accessors of a
+property when first used. Inline advices are part of the function they are
+woven into, so the modules whose globals they use are imported with the woven
+module, through the import_module helper."""
+
+import hashlib
+import imp
+import os
+import sys
+
+import bytecode
+
+
+NAME = '_aopy_bootstrap'
+
+# the helpers of lazy mode, one per kind of reference
+LAZY_SOURCE = '''
+def import_module(modulename):
+    __import__(modulename)
+    return sys.modules[modulename]
+
+def _resolve(modulename, objname):
+    return getattr(import_module(modulename), objname)
+
+def lazy_decorator(modulename, objname):
+    def decorate(func):
+        if not isinstance(func, type(_resolve)):
+            # a wrapper would lose the binding of a classmethod, staticmethod
+            # or property, so anything but a plain function is decorated now
+            return _resolve(modulename, objname)(func)
+        decorated = []
+        name = getattr(func, '__name__', None)
+        globals = getattr(func, '__globals__', {})
+        def wrapper(*args, **kwargs):
+            if not decorated:
+                decorated.append(_resolve(modulename, objname)(func))
+                if name and globals.get(name) is wrapper:
+                    globals[name] = decorated[0]
+            return decorated[0](*args, **kwargs)
+        wrapper.__name__ = name or wrapper.__name__
+        wrapper.__doc__ = getattr(func, '__doc__', None)
+        wrapper.__module__ = getattr(func, '__module__', None)
+        wrapper.__dict__.update(getattr(func, '__dict__', {}))
+        return wrapper
+    return decorate
+
+def lazy_metaclass(modulename, objname):
+    def metaclass(name, bases, dct):
+        return _resolve(modulename, objname)(name, bases, dct)
+    return metaclass
+
+def lazy_function(modulename, objname):
+    resolved = []
+    def function(*args, **kwargs):
+        if not resolved:
+            resolved.append(_resolve(modulename, objname))
+        return resolved[0](*args, **kwargs)
+    return function
+'''
+
+
+class Bootstrap(object):
+    """What woven modules need to know of their bootstrap module: the name
+    it is imported by, the directory it is imported from (None if it is
+    registered in memory) and whether it binds advices lazily"""
+    def __init__(self, name, lazy=False, path=None):
+        self.name = name
+        self.lazy = lazy
+        self.path = path
+
+    def get_helper(self, kind):
+        """The name of the lazy helper for a kind of reference ('decorator',
+        'metaclass' or 'function'), and the name it goes by in a woven
+        module"""
+        return ('lazy_' + kind, '_aopy_lazy_' + kind)
+
+    def get_importer(self):
+        """The name of the helper that imports a module in lazy mode, and the
+        name it goes by in a woven module"""
+        return ('import_module', '_aopy_import_module')
+
+
+def get_canonical_names(modulenames):
+    """Map each module name to a distinct name for the bootstrap
+
+    >>> sorted(get_canonical_names(['a.b', 'a_b', 'c']).items())
+    [('a.b', 'a_b'), ('a_b', 'a_b_'), ('c', 'c')]
+    """
+
+    names = {}
+    taken = set()
+    for modulename in sorted(set(modulenames)):
+        name = modulename.replace('.', '_')
+        while name in taken:
+            name += '_'
+        taken.add(name)
+        names[modulename] = name
+    return names
+
+def get_source(worklist, lazy=False):
+    """The source of the bootstrap module for the advices of the worklist"""
+    lines = ['"""Generated by aopyc, imports the advice modules of the woven',
+             'modules"""', '', 'import sys', '']
+    for path in sorted(worklist.get_module_paths()):
+        lines.append('if %r not in sys.path:' % path)
+        lines.append('    sys.path.append(%r)' % path)
+    lines.append('')
+    if lazy:
+        return '\n'.join(lines) + LAZY_SOURCE
+    names = get_canonical_names([name for (name, _) in worklist.get_modules()])
+    for (modulename, name) in sorted(names.items()):
+        lines.append('import %s as %s' % (modulename, name))
+    return '\n'.join(lines) + '\n'
+
+def get_name(key):
+    """The name of the bootstrap made for a key, the root of a tree or the
+    fingerprint of a worklist
+
+    >>> get_name('/path/to/root')
+    '_aopy_bootstrap_7b67eb32'
+    """
+
+    return '%s_%s' % (NAME, hashlib.sha1(key).hexdigest()[:8])
+
+def get_location(root):
+    """The name the bootstrap at the root of a tree is imported by, within
+    the package the root is, if it is one, and the directory it is imported
+    from"""
+    root = os.path.abspath(root)
+    parts = [get_name(root)]
+    while os.path.isfile(os.path.join(root, '__init__.py')):
+        parts.insert(0, os.path.basename(root))
+        root = os.path.dirname(root)
+    return ('.'.join(parts), root)
+
+def get_pycfile(root):
+    root = os.path.abspath(root)
+    return os.path.join(root, get_name(root) + '.pyc')
+
+def write(root, worklist, mode=bytecode.TIMESTAMP, lazy=False):
+    """Write the bootstrap module for the worklist at the root of a tree,
+    return the Bootstrap"""
+    pycfile = get_pycfile(root)
+    code = compile(get_source(worklist, lazy), pycfile, 'exec')
+    bytecode.write(pycfile, code, None, mode=mode)
+    (name, path) = get_location(root)
+    return Bootstrap(name, lazy, path)
+
+def install(worklist, fingerprint, lazy=False):
+    """Register the bootstrap module for the worklist in memory, return the
+    Bootstrap. The fingerprint tells worklists apart, those with the same
+    one share a bootstrap."""
+    name = get_name(fingerprint)
+    if name not in sys.modules:
+        module = imp.new_module(name)
+        module.__file__ = '<%s>' % name
+        code = compile(get_source(worklist, lazy), module.__file__, 'exec')
+        exec(code, module.__dict__)
+        sys.modules[name] = module
+    return Bootstrap(name, lazy)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
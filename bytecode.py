@@ -0,0 +1,76 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""Writing bytecode files. A file is written to a temp file in its directory
+and renamed into place, so that an import running at the same time never reads
+a partial file. The header is validated either by the mtime of the source
+(timestamp, the only kind python 2 knows) or, from python 3.7, by a hash of
+the source (PEP 552). With a hash, the same source woven the same way always
+produces the same bytes, and an unchecked hash is never validated at all.
+aopyc runs on python 2, so it always writes timestamps, hashes are only
+available to the ast backend used as a library on python 3."""
+
+import marshal
+import os
+import struct
+import sys
+
+import filepath
+
+
+TIMESTAMP = 'timestamp'
+CHECKED_HASH = 'checked-hash'
+UNCHECKED_HASH = 'unchecked-hash'
+MODES = (TIMESTAMP, CHECKED_HASH, UNCHECKED_HASH)
+
+if sys.version_info[0] >= 3:
+    import importlib.util
+    MAGIC = importlib.util.MAGIC_NUMBER
+else:
+    import imp
+    MAGIC = imp.get_magic()
+
+
+def check_mode(mode):
+    """Raise ValueError unless this python can write headers of mode"""
+    if mode not in MODES:
+        raise ValueError("Unknown invalidation mode: %s" % mode)
+    if mode != TIMESTAMP and sys.version_info < (3, 7):
+        raise ValueError("Invalidation mode %s needs python 3.7 or later, "
+                         "this is python %d.%d" % ((mode, ) + sys.version_info[:2]))
+
+def pack(n):
+    return struct.pack('<I', int(n) & 0xFFFFFFFF)
+
+def get_header(source_file, mode=TIMESTAMP):
+    """The header of a bytecode file for the source, in the format of the
+    running python. A file without source (None) is never validated, so its
+    header is all zeros."""
+    check_mode(mode)
+    if source_file is None:
+        (mtime, size) = (0, 0)
+    elif mode != TIMESTAMP:
+        flags = 0x01
+        if mode == CHECKED_HASH:
+            flags |= 0x02
+        source = open(source_file, 'rb').read()
+        return MAGIC + pack(flags) + importlib.util.source_hash(source)
+
+    else:
+        st = os.stat(source_file)
+        (mtime, size) = (st.st_mtime, st.st_size)
+    if sys.version_info >= (3, 7):
+        return MAGIC + pack(0) + pack(mtime) + pack(size)
+    elif sys.version_info >= (3, 3):
+        return MAGIC + pack(mtime) + pack(size)
+    return MAGIC + pack(mtime)
+
+def write(pycfile, code, source_file, mode=TIMESTAMP):
+    """Write code to pycfile atomically, return the number of bytes written"""
+    data = get_header(source_file, mode) + marshal.dumps(code)
+    # readable like the source, as the import system does
+    perms = 0o644
+    if source_file:
+        perms = os.stat(source_file).st_mode & 0o666
+    filepath.write_atomic(pycfile, data, perms)
+    return len(data)
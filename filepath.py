@@ -3,8 +3,10 @@
 
 """Mix in classes for path handling"""
 
+import hashlib
 import os
 import sys
+import tempfile
 
 
 class File(object):
@@ -96,6 +98,61 @@ def is_writable(file):
     elif os.access(os.path.dirname(file), os.W_OK):
         return True
 
+def hash_file(file):
+    """Return a hex digest of the file's contents
+
+    >>> import tempfile
+    >>> fd = tempfile.NamedTemporaryFile(prefix=".doctest_")
+    >>> hash_file(fd.name)
+    'da39a3ee5e6b4b0d3255bfef95601890afd80709'
+    >>> fd.close()
+    """
+
+    return hashlib.sha1(open(file, 'rb').read()).hexdigest()
+
+def write_atomic(file, data, perms=0o644):
+    """Write data to a temp file in the directory of file and rename it into
+    place, so that a reader never sees a partial file. The temp file is
+    removed if anything goes wrong.
+
+    >>> import shutil, tempfile
+    >>> dir = tempfile.mkdtemp(prefix=".doctest_")
+    >>> write_atomic(os.path.join(dir, 'sub', 'file'), 'data')
+    >>> open(os.path.join(dir, 'sub', 'file')).read()
+    'data'
+    >>> os.listdir(os.path.join(dir, 'sub'))
+    ['file']
+    >>> shutil.rmtree(dir)
+    """
+
+    dir = os.path.dirname(os.path.abspath(file))
+    if not os.path.isdir(dir):
+        os.makedirs(dir)
+    (fd, tmpfile) = tempfile.mkstemp(dir=dir, suffix='.tmp')
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        os.chmod(tmpfile, perms)
+        if hasattr(os, 'replace'):
+            os.replace(tmpfile, file)
+        else:
+            os.rename(tmpfile, file)
+    except:
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)
+        raise
+
+def get_source_file(file):
+    """The source of a module file: a .py file next to a .pyc or .pyo, if
+    there is one, otherwise the file itself"""
+    (root, ext) = os.path.splitext(file)
+    if ext in ('.pyc', '.pyo') and os.path.exists(root + '.py'):
+        return root + '.py'
+    return file
+
 def try_import(module_name=None, module_file=None):
     """Import module by module name or file name, return module object"""
     assert module_name or module_file
@@ -111,6 +168,31 @@ def try_import(module_name=None, module_file=None):
         modobj = __import__(m.file_name_root)
     return modobj
 
+# module name -> absolute path of module file
+_module_files = {}
+
+def find_module_file(module_name):
+    """Return the absolute path of the file a module name resolves to. The
+    module is only imported the first time, since many objects tend to come
+    from the same few modules. A dotted name resolves to the submodule, not
+    to the package __import__ returns.
+
+    >>> find_module_file('os') == os.path.abspath(os.__file__)
+    True
+    >>> find_module_file('os.path') == os.path.abspath(os.path.__file__)
+    True
+    >>> _module_files['os'] == find_module_file('os')
+    True
+    """
+
+    try:
+        return _module_files[module_name]
+    except KeyError:
+        try_import(module_name=module_name)
+        file = sys.modules[module_name].__file__
+        file = _module_files[module_name] = os.path.abspath(file)
+        return file
+
 
 if __name__ == "__main__":
     import doctest
@@ -0,0 +1,160 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""Weaving at import time. install() puts a finder on sys.meta_path (PEP 302)
+that weaves modules as they are imported, so nothing is written next to the
+sources, and modules that are never imported are never woven. Only modules
+some advice could apply to are taken over, judged by their name before the
+file system is even searched, the rest are left to the regular import.
+
+A module's local name is its dotted name as a path, like pkg/mod (and
+pkg/__init__ for a package), the same as when aopyc weaves the directory on
+sys.path it is found in. Woven code is kept in memory, and optionally in a
+cache directory, under a key made from the source, the worklist's fingerprint
+and the python version."""
+
+import hashlib
+import imp
+import marshal
+import os
+import sys
+
+from aspect import Aspect, Worklist
+from modulecompiler import BACKENDS, ModuleCompiler
+import bootstrap
+import bytecode
+import filepath
+
+
+class WeavingFinder(object):
+    """Find the modules that may match the worklist, and weave them"""
+    SUFFIX = '.code'
+
+    def __init__(self, worklist, cache_dir=None, backend='compiler',
+                 lazy=False):
+        self.worklist = worklist
+        self.cache_dir = cache_dir
+        self.backend = backend
+        self.codes = {}
+        self.fingerprint = '%s %s' % (lazy, worklist.fingerprint())
+        self.bootstrap = bootstrap.install(worklist, self.fingerprint,
+                                           lazy=lazy)
+
+    def find_module(self, fullname, path=None):
+        local_name = fullname.replace('.', '/')
+        if not (self.worklist.may_match_module(local_name) or
+                self.worklist.may_match_module(local_name + '/__init__')):
+            return None
+
+        try:
+            (fp, filename, (_, _, kind)) = imp.find_module(
+                fullname.rpartition('.')[2], path)
+        except ImportError:
+            return None
+        if fp:
+            fp.close()
+
+        if kind == imp.PKG_DIRECTORY:
+            source = os.path.join(filename, '__init__.py')
+            local_name += '/__init__'
+            if not os.path.isfile(source):
+                return None
+        elif kind == imp.PY_SOURCE:
+            source = filename
+        else:
+            return None
+        if not self.worklist.may_match_module(local_name):
+            return None
+        return WeavingLoader(self, source, local_name,
+                             kind == imp.PKG_DIRECTORY)
+
+    def get_code(self, file, local_name):
+        """The woven code of a module, from the cache if possible"""
+        source = open(file, 'rU').read()
+        key = hashlib.sha1('\0'.join((bytecode.MAGIC, self.backend,
+                                      self.fingerprint, file, local_name,
+                                      source))).hexdigest()
+        code = self.codes.get(key)
+        if code is None:
+            code = self.load(key)
+            if code is None:
+                code = self.weave(file, local_name, source)
+                self.store(key, code)
+            self.codes[key] = code
+        return code
+
+    def weave(self, file, local_name, source):
+        m = BACKENDS[self.backend](file)
+        m.local_name = local_name
+        worklist = self.worklist.mangle(m.find_names())
+        if m.transform(worklist, bootstrap=self.bootstrap):
+            m.compile(display=False)
+            return m.code
+        # nothing matched after all
+        return compile(source + '\n', file, 'exec')
+
+    def get_cachefile(self, key):
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def load(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            return marshal.loads(open(self.get_cachefile(key), 'rb').read())
+        except (IOError, EOFError, ValueError, TypeError):
+            return None
+
+    def store(self, key, code):
+        """Store the code, written to a temp file and renamed into place"""
+        if not self.cache_dir:
+            return
+        try:
+            filepath.write_atomic(self.get_cachefile(key), marshal.dumps(code))
+        except (IOError, OSError):
+            pass
+
+
+class WeavingLoader(object):
+    def __init__(self, finder, file, local_name, is_package):
+        self.finder = finder
+        self.file = file
+        self.local_name = local_name
+        self.is_package = is_package
+
+    def load_module(self, fullname):
+        code = self.finder.get_code(self.file, self.local_name)
+        is_new = fullname not in sys.modules
+        module = sys.modules.setdefault(fullname, imp.new_module(fullname))
+        module.__file__ = self.file
+        module.__loader__ = self
+        if self.is_package:
+            module.__path__ = [os.path.dirname(self.file)]
+            module.__package__ = fullname
+        else:
+            module.__package__ = fullname.rpartition('.')[0]
+        try:
+            exec code in module.__dict__
+        except:
+            if is_new:
+                del sys.modules[fullname]
+            raise
+        return sys.modules[fullname]
+
+
+def install(spec, cache_dir=None, backend='compiler', lazy=False):
+    """Weave modules as they are imported from now on. The spec is a spec
+    file (or table) like the compiler takes, an Aspect or a list of Aspects.
+    Return the finder, which uninstall() removes again."""
+    if isinstance(spec, basestring):
+        worklist = ModuleCompiler(spec).load_spec(spec)
+    elif isinstance(spec, Aspect):
+        worklist = Worklist(spec)
+    else:
+        worklist = Worklist(*spec)
+    finder = WeavingFinder(worklist, cache_dir=cache_dir, backend=backend,
+                           lazy=lazy)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+def uninstall(finder):
+    sys.meta_path.remove(finder)
@@ -0,0 +1,104 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""The join point index records every join point in a tree (classes,
+functions, instance attributes and call sites, by pathspec), so that
+questions like which join points a pattern or a spec hits can be answered
+without parsing or transforming anything. The index is kept next to the tree and brought up to
+date on use, only modules whose source has changed are parsed again."""
+
+import json
+import os
+import re
+
+import aspect
+import filepath
+from modulecompiler import ModuleCompiler
+
+
+# the types of advice that apply to each kind of join point
+ADVICES = {
+    'class': (aspect.MetaclassAdvice, ),
+    'function': (aspect.DecoratorAdvice, aspect.InlineAdvice),
+    'attribute': (aspect.PropertyAdvice, ),
+    'call': (aspect.CallAdvice, ),
+}
+
+
+class JoinPointIndex(object):
+    FILENAME = '.aopyc_joinpoints'
+    VERSION = 2
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.isfile(path):
+            path = os.path.dirname(path)
+        self.file = os.path.join(path, self.FILENAME)
+        self.entries = {}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        try:
+            data = json.load(open(self.file))
+        except (IOError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            self.entries = data.get('modules', {})
+
+    def save(self):
+        if not self.changed:
+            return
+        data = {'version': self.VERSION, 'modules': self.entries}
+        filepath.write_atomic(self.file,
+                              json.dumps(data, indent=1, sort_keys=True))
+        self.changed = False
+
+    def update(self, files, cache=None):
+        """Bring the index up to date with the files. A module is trusted if
+        its size and mtime are unchanged, otherwise it is hashed, and only
+        parsed if the hash has changed."""
+        files = set(files)
+        for file in list(self.entries):
+            if file not in files:
+                del self.entries[file]
+                self.changed = True
+
+        for file in sorted(files):
+            st = os.stat(file)
+            stat = [st.st_mtime, st.st_size]
+            entry = self.entries.get(file)
+            if entry and entry['stat'] == stat:
+                continue
+
+            hash = filepath.hash_file(file)
+            if not entry or entry['hash'] != hash:
+                m = ModuleCompiler(file, basepath=self.path, cache=cache)
+                entry = {'joinpoints': m.find_joinpoints()}
+                m.release()
+            entry.update(stat=stat, hash=hash)
+            self.entries[file] = entry
+            self.changed = True
+        self.save()
+
+    def __iter__(self):
+        """Iterate over (kind, pathspec) in all modules"""
+        for file in sorted(self.entries):
+            for (kind, pathspec) in self.entries[file]['joinpoints']:
+                yield (kind, pathspec)
+
+    def find(self, pattern):
+        """The join points a pattern matches"""
+        regex = re.compile(pattern)
+        return [(kind, pathspec) for (kind, pathspec) in self
+                if regex.match(pathspec)]
+
+    def match(self, worklist):
+        """The join points each advice in the worklist would be woven into,
+        as (advice, kind, pathspec)"""
+        matches = []
+        for (kind, pathspec) in self:
+            for cls in ADVICES[kind]:
+                for advice in worklist.match(cls, pathspec):
+                    matches.append((advice, kind, pathspec))
+        return matches
@@ -0,0 +1,87 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""Logging for the weaver, on the 'aopy' logger. There are three levels:
+quiet only reports problems, summary (the default of the compiler) reports the
+modules woven, and trace reports every module considered and every join point
+matched. Output is buffered and written in batches, and trace messages can be
+sampled, so that tracing a large tree does not drown in its own output."""
+
+import logging
+import sys
+
+
+QUIET = logging.WARNING
+SUMMARY = logging.INFO
+TRACE = logging.DEBUG
+
+LEVELS = {
+    'quiet': QUIET,
+    'summary': SUMMARY,
+    'trace': TRACE,
+}
+
+logger = logging.getLogger('aopy')
+logger.addHandler(logging.NullHandler())
+
+
+class BufferedHandler(logging.StreamHandler):
+    """Write records to the stream in batches rather than one write per
+    record. Warnings and errors are written at once, with whatever preceded
+    them."""
+    def __init__(self, stream=None, capacity=1000):
+        logging.StreamHandler.__init__(self, stream)
+        self.capacity = capacity
+        self.buffer = []
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.buffer) >= self.capacity or record.levelno >= QUIET:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                self.stream.write(''.join(self.buffer))
+                self.buffer = []
+            if hasattr(self.stream, 'flush'):
+                self.stream.flush()
+        finally:
+            self.release()
+
+
+class SampleFilter(logging.Filter):
+    """Let through one in every n trace records, and all others"""
+    def __init__(self, n):
+        logging.Filter.__init__(self)
+        self.n = n
+        self.seen = 0
+
+    def filter(self, record):
+        if record.levelno > TRACE:
+            return True
+        self.seen += 1
+        return (self.seen - 1) % self.n == 0
+
+
+def configure(level=SUMMARY, sample=1, stream=None):
+    """Log to stream (stderr) at level, keeping one in every sample trace
+    messages"""
+    handler = BufferedHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    if sample > 1:
+        handler.addFilter(SampleFilter(sample))
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+def flush():
+    """Write out buffered messages, before forking and when a worker process
+    finishes a task, since workers exit without flushing"""
+    for handler in logger.handlers:
+        handler.flush()
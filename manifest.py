@@ -0,0 +1,105 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""The manifest records the state of a woven tree, so that a later run only
+has to weave the modules that have changed. For every module it stores a hash
+of the source, the names found in it and the outcome of the last weave. The
+outcome is only valid as long as the fingerprint of the worklist it was woven
+with stays the same. The bootstrap module the woven modules import is
+recorded the same way."""
+
+import json
+import os
+
+import filepath
+
+
+class Manifest(filepath.File):
+    FILENAME = '.aopyc_manifest'
+    VERSION = 2
+
+    def __init__(self, path):
+        if os.path.isfile(path):
+            path = os.path.dirname(path)
+        self.file = os.path.join(path, self.FILENAME)
+        self.fingerprint = None
+        self.entries = {}
+        self.bootstrap = None
+        self.hashes = {}
+        self.load()
+
+    def load(self):
+        try:
+            data = json.load(open(self.file))
+        except (IOError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            self.entries = data.get('modules', {})
+            self.bootstrap = data.get('bootstrap')
+
+    def save(self):
+        data = {'version': self.VERSION, 'modules': self.entries,
+                'bootstrap': self.bootstrap}
+        filepath.write_atomic(self.file,
+                              json.dumps(data, indent=1, sort_keys=True))
+
+
+    def get_hash(self, file):
+        """Hash each source file at most once per run"""
+        if file not in self.hashes:
+            self.hashes[file] = filepath.hash_file(file)
+        return self.hashes[file]
+
+    def get_entry(self, file):
+        """Return the entry for the file if the source has not changed"""
+        entry = self.entries.get(file)
+        if entry and entry['hash'] == self.get_hash(file):
+            return entry
+
+    def get_names(self, file):
+        entry = self.get_entry(file)
+        if entry:
+            return entry['names']
+
+    def is_current(self, file, pycfile):
+        """A module need not be woven again if neither the source nor the
+        worklist has changed, and the bytecode we wrote is still there."""
+        entry = self.get_entry(file)
+        if not entry or entry.get('fingerprint') != self.fingerprint:
+            return False
+        if entry['pyc']:
+            return entry['pyc'] == self.stat(pycfile)
+        return True
+
+    def record(self, file, names, pycfile=None):
+        """Record the outcome of weaving a module, pycfile is given if the
+        module was woven"""
+        entry = {
+            'hash': self.get_hash(file),
+            'names': sorted(names),
+            'fingerprint': self.fingerprint,
+            'pyc': None,
+        }
+        if pycfile:
+            entry['pyc'] = self.stat(pycfile)
+        self.entries[file] = entry
+
+    def needs_bootstrap(self, pycfile):
+        """Whether the bootstrap must be written although no module is woven:
+        modules woven before import it, and it is gone, or was not written
+        for this worklist."""
+        if not [entry for entry in self.entries.values() if entry['pyc']]:
+            return False
+        return self.bootstrap != {'fingerprint': self.fingerprint,
+                                  'pyc': self.stat(pycfile)}
+
+    def record_bootstrap(self, pycfile):
+        self.bootstrap = {'fingerprint': self.fingerprint,
+                          'pyc': self.stat(pycfile)}
+
+    def stat(self, file):
+        try:
+            st = os.stat(file)
+        except OSError:
+            return None
+        return [st.st_mtime, st.st_size]
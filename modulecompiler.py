@@ -3,20 +3,39 @@
 
 import compiler
 import compiler.ast as ast
+import collections
+import fnmatch
+import multiprocessing
 import os
 import sys
+import traceback
 
-from aspect import Aspect, Worklist
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+from aspect import Aspect, Worklist, load_table
+from log import logger
+from stats import NULL_STATS, Stats
 import astpp
+import astweaver
+import bytecode
 import filepath
+import log
 import visitors
 
 
 class ModuleCompiler(compiler.pycodegen.Module, filepath.Module):
-    def __init__(self, filename, basepath=None):
+    def __init__(self, filename, basepath=None, cache=None, stats=NULL_STATS):
         self.filename = filename
         self.source = filename
         self.tree = None
+        self.cache = cache
+        self.stats = stats
 
         if basepath:
             base = os.path.commonprefix([self.file_path, basepath])
@@ -48,95 +67,458 @@ class ModuleCompiler(compiler.pycodegen.Module, filepath.Module):
     tree = property(fget=get_tree, fset=set_tree)
 
     def parse(self):
-        tree = compiler.parse(open(self.file).read(), self.mode)
-        compiler.misc.set_filename(self.file, tree)
-        compiler.syntax.check(tree)
+        """Parse and check the source, unless the tree is in the cache"""
+        source = open(self.file).read()
+        if self.cache:
+            with self.stats.timer('load', self.file):
+                tree = self.cache.load(self.file, source)
+            if tree:
+                self.tree = tree
+                return
+
+        with self.stats.timer('parse', self.file):
+            tree = compiler.parse(source, self.mode)
+            compiler.misc.set_filename(self.file, tree)
+        with self.stats.timer('check', self.file):
+            compiler.syntax.check(tree)
+        if self.cache:
+            self.cache.store(self.file, source, tree)
         self.tree = tree
 
+    def release(self):
+        """Drop the tree and the code, the tree is parsed again on demand"""
+        self.tree = None
+        self.code = None
+
     def display(self):
         print astpp.SimpleTreePPrinter().display(self.tree)
 #        print astpp.TreePPrinter(self.file_name).display(self.tree)
 
 
     def find_names(self):
-        namefinder = visitors.NameFinderVisitor()
-        compiler.walk(self.tree, namefinder)
-        return namefinder.get_names()
+        """Find the names in the module with the ast module, which parses
+        several times faster than the compiler package, so that only the
+        modules that are woven are parsed by the compiler, and only once"""
+        m = astweaver.AstModule(self.file, stats=self.stats)
+        return m.find_names()
+
+    def find_joinpoints(self):
+        finder = visitors.JoinPointFinderVisitor(self.local_name)
+        finder.walk(self.tree)
+        return finder.get_joinpoints()
 
     def find_imports(self):
         namefinder = visitors.ImportFinderVisitor()
-        compiler.walk(self.tree, namefinder)
+        namefinder.walk(self.tree)
         return namefinder.get_names()
 
 
-    def transform(self, worklist):
-        trans = visitors.TransformerVisitor.PHASE_TRANSFORM
-        post = visitors.TransformerVisitor.PHASE_POST
+    def may_match(self, worklist):
+        """Rule out modules no advice can apply to, without parsing"""
+        return worklist.may_match_module(self.local_name)
 
-        sys.stderr.write("Transforming module %s\n" % self.file)
-        visitor = visitors.TransformerVisitor(trans, self.local_name, worklist)
-        compiler.walk(self.tree, visitor)
-        if visitor.matched_advices:
-            worklist = visitor.matched_advices
-            visitor = visitors.TransformerVisitor(post, self.local_name, worklist)
-            compiler.walk(self.tree, visitor)
-            compiler.syntax.check(self.tree)     # ?
+    def transform(self, worklist, bootstrap=None):
+        if not self.may_match(worklist):
+            return
+
+        logger.debug("Transforming module %s", self.file)
+        tree = self.tree
+        visitor = visitors.TransformerVisitor(self.local_name, worklist,
+                                              stats=self.stats,
+                                              bootstrap=bootstrap)
+        with self.stats.timer('transform', self.file):
+            matched = visitor.transform(tree)
+        self.stats.count(self.file, 'nodes', visitor.nodes)
+        if matched:
+            with self.stats.timer('check', self.file):
+                compiler.syntax.check(tree)     # ?
+            logger.info("Woven module %s", self.file)
             return True
 
-    def writepyc(self, verbose=False):
+    def writepyc(self, verbose=False, invalidation=bytecode.TIMESTAMP):
         if verbose:
             self.display()
-        self.compile(display=False)
-        self.dump(open(self.pycfile, 'w'))
+        with self.stats.timer('compile', self.file):
+            self.compile(display=False)
+        with self.stats.timer('dump', self.file):
+            size = bytecode.write(self.pycfile, self.code, self.file,
+                                  mode=invalidation)
+        self.stats.count(self.file, 'bytes', size)
+
 
+    def chase_imports(self, resolver=None, within=None):
+        """Find the modules this module reaches through its imports, including
+        itself, by parsing them and resolving the imports statically. Only
+        modules under the path within, if given, are followed. The imports of
+        a module that does not parse are not followed, the module itself is
+        reported when it fails to weave.
 
-    def chase_imports(self):
-        modules = set()
-        queue = [self.file_name_root]
-        for name in queue:
+        >>> import shutil, tempfile
+        >>> root = tempfile.mkdtemp(prefix=".doctest_")
+        >>> for (file, source) in [
+        ...         ('main.py', 'import helper; from pkg import sub'),
+        ...         ('helper.py', ''),
+        ...         ('pkg/__init__.py', ''),
+        ...         ('pkg/sub.py', 'from . import rel; from .. import helper'),
+        ...         ('pkg/rel.py', 'import os; from . import broken'),
+        ...         ('pkg/broken.py', 'def f(:')]:
+        ...     filepath.write_atomic(os.path.join(root, file), source)
+        >>> def chase(file, within):
+        ...     m = ModuleCompiler(os.path.join(root, file))
+        ...     within = os.path.normpath(os.path.join(root, within))
+        ...     modules = m.chase_imports(within=within)
+        ...     return sorted([os.path.relpath(r.file, root) for r in modules])
+        >>> chase('main.py', '')
+        ['helper.py', 'main.py', 'pkg/__init__.py', 'pkg/broken.py', 'pkg/rel.py', 'pkg/sub.py']
+        >>> chase('pkg/sub.py', 'pkg')
+        ['pkg/__init__.py', 'pkg/broken.py', 'pkg/rel.py', 'pkg/sub.py']
+        >>> shutil.rmtree(root)
+        """
+        if not resolver:
+            resolver = ImportResolver()
+        modules = []
+        seen = set([self.file])
+        queue = collections.deque([self.file])
+        while queue:
+            file = queue.popleft()
+            m = ModuleCompiler(file)
+            if not filepath.is_writable(m.pycfile):
+                logger.warning("Path cannot be written to: %s", m.pycfile)
+            else:
+                modules.append(m)
             try:
-                modobj = filepath.try_import(module_name=name)
-                file = getattr(modobj, '__file__', None)
-                if not file:
-                    sys.stderr.write("Module object %s missing __name__ att\n" % name)
-                    raise Exception
-                (base, _) = os.path.splitext(file)
-                m = ModuleCompiler(base + '.py')
-                if file not in (m.file, m.pycfile):
-                    sys.stderr.write("Module cannot be parsed: %s\n" % file)
-                    raise Exception
-                if not os.path.exists(m.file):
-                    sys.stderr.write("Module does not exist: %s\n" % m.file)
-                    raise Exception
-                if not filepath.is_writable(m.pycfile):
-                    sys.stderr.write("Path cannot be written to: %s\n" % m.pycfile)
-                else:
-                    modules.add(m)
-                found = m.find_imports()
-                for f in found:
-                    if f not in queue:
-                        queue.append(f)
-            except:
-                raise
-        return list(modules)
+                imports = resolver.get_imports(file)
+            except Exception:
+                imports = []
+            for name in imports:
+                found = resolver.find(name, importer=file)
+                if not found or found in seen:
+                    continue
+                if within and not found.startswith(within + os.sep):
+                    continue
+                seen.add(found)
+                queue.append(found)
+        return modules
 
     def load_spec(self, file):
+        if os.path.splitext(file)[1] in ('.csv', '.json'):
+            return Worklist(load_table(file))
         spec = filepath.try_import(module_file=file)
         aspnames = (aspname for aspname in spec.__all__)
         aspects = (getattr(spec, aspname) for aspname in aspnames)
         return Worklist(*aspects)
 
-    def find_modules(self, path):
-        modules = []
-        for (dir, dirs, files) in os.walk(path):
-            for f in files:
-                f = os.path.join(dir, f)
-                (_, e) = os.path.splitext(f)
-                if e == '.py':
-                    pyc = f + 'c'
-                    if not filepath.is_writable(pyc):
-                        sys.stderr.write("Path cannot be written to: %s\n" % pyc)
-                    else:
-                        modules.append(f)
-        modules = list(set(modules))
-        return modules
+    def find_modules(self, path, excludes=()):
+        """Find modules under path lazily, pruning directories that never
+        contain modules to weave (version control, virtualenvs, installed
+        packages), as well as anything matching a glob in excludes or in an
+        ignore file at the root of path."""
+        excludes = list(excludes) + read_ignorefile(path)
+        stack = [path]
+        while stack:
+            dir = stack.pop()
+            try:
+                (dirs, files) = listdir(dir)
+            except OSError:
+                logger.warning("Path cannot be read: %s", dir)
+                continue
+            if VIRTUALENV_MARKER in files:
+                continue
+
+            writable = os.access(dir, os.W_OK)
+            names = set(files)
+            for f in sorted(files):
+                if not f.endswith('.py'):
+                    continue
+                file = os.path.join(dir, f)
+                if is_excluded(file, path, excludes):
+                    continue
+                if f + 'c' in names:
+                    pyc_writable = os.access(file + 'c', os.W_OK)
+                else:
+                    pyc_writable = writable
+                if not pyc_writable:
+                    logger.warning("Path cannot be written to: %s", file + 'c')
+                else:
+                    yield file
+
+            for d in sorted(dirs, reverse=True):
+                subdir = os.path.join(dir, d)
+                if d not in PRUNED_DIRS and not is_excluded(subdir, path, excludes):
+                    stack.append(subdir)
+
+
+class ImportResolver(object):
+    """Map module names to source files the way the import system would find
+    them, by looking through the search path and the package layout, but
+    without importing (and so executing) anything. Lookups, and the imports
+    found in each file, are cached."""
+
+    def __init__(self, path=None):
+        if path is None:
+            path = sys.path
+        self.path = [os.path.abspath(dir or os.curdir) for dir in path]
+        self.files = {}
+        self.imports = {}
+
+    def get_imports(self, file):
+        if file not in self.imports:
+            m = ModuleCompiler(file)
+            self.imports[file] = m.find_imports()
+            m.release()
+        return self.imports[file]
+
+    def find(self, name, importer=None):
+        """Return the source file of a module, or None if it cannot be found
+        (or is not a source module, like an extension). Relative imports
+        (with leading dots) and implicit relative imports are resolved against
+        the directory of the importer.
+
+        >>> import shutil, tempfile
+        >>> root = tempfile.mkdtemp(prefix=".doctest_")
+        >>> for file in ('main.py', 'helper.py', 'pkg/__init__.py',
+        ...              'pkg/sub.py', 'pkg/rel.py'):
+        ...     filepath.write_atomic(os.path.join(root, file), '')
+        >>> resolver = ImportResolver(path=[root])
+        >>> def find(name, importer=None):
+        ...     if importer:
+        ...         importer = os.path.join(root, importer)
+        ...     file = resolver.find(name, importer=importer)
+        ...     return file and os.path.relpath(file, root)
+        >>> find('helper', importer='pkg/sub.py')  # on the path
+        'helper.py'
+        >>> find('missing', importer='pkg/sub.py') is None
+        True
+        >>> find('rel', importer='pkg/sub.py')     # implicit relative
+        'pkg/rel.py'
+        >>> find('pkg')
+        'pkg/__init__.py'
+        >>> find('pkg.sub')                        # from pkg import sub
+        'pkg/sub.py'
+        >>> find('pkg.name') is None               # from pkg import name
+        True
+        >>> find('.rel', importer='pkg/sub.py')
+        'pkg/rel.py'
+        >>> find('.', importer='pkg/sub.py')
+        'pkg/__init__.py'
+        >>> find('..helper', importer='pkg/sub.py')
+        'helper.py'
+        >>> find('.rel') is None                   # relative, no importer
+        True
+        >>> shutil.rmtree(root)
+        """
+        dir = None
+        if importer:
+            dir = os.path.dirname(importer)
+        key = (name, dir)
+        if key not in self.files:
+            self.files[key] = self.lookup(name, dir)
+        return self.files[key]
+
+    def lookup(self, name, dir):
+        parts = name.lstrip('.').split('.')
+        level = len(name) - len(name.lstrip('.'))
+        if level:
+            if not dir:
+                return None
+            for i in range(level-1):
+                dir = os.path.dirname(dir)
+            return self.find_in(dir, parts, relative=True)
+
+        dirs = self.path
+        if dir:
+            dirs = [dir] + dirs
+        for dir in dirs:
+            file = self.find_in(dir, parts)
+            if file:
+                return file
+
+    def find_in(self, dir, parts, relative=False):
+        """Find the module in dir, every package on the way must have an
+        __init__.py"""
+        if relative and parts == ['']:
+            parts = []
+        for part in parts[:-1]:
+            dir = os.path.join(dir, part)
+            if not os.path.isfile(os.path.join(dir, '__init__.py')):
+                return None
+        if not parts:
+            candidates = [os.path.join(dir, '__init__.py')]
+        else:
+            base = os.path.join(dir, parts[-1])
+            candidates = [base + '.py', os.path.join(base, '__init__.py')]
+        for file in candidates:
+            if os.path.isfile(file):
+                return file
+
+
+## Module discovery
+
+# directories that are never searched for modules
+PRUNED_DIRS = set(['.git', '.hg', '.svn', '.bzr', 'CVS', '__pycache__',
+                   '__aopycache__', 'site-packages', 'dist-packages'])
+VIRTUALENV_MARKER = 'pyvenv.cfg'
+IGNOREFILE = '.aopycignore'
+
+def listdir(dir):
+    """List a directory as (subdirectories, files), leaving out links to
+    directories. Uses scandir where available, to avoid a stat call per
+    entry."""
+    dirs = []
+    files = []
+    if scandir:
+        for entry in scandir(dir):
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.name)
+            elif not entry.is_dir():
+                files.append(entry.name)
+    else:
+        for name in os.listdir(dir):
+            if os.path.isdir(os.path.join(dir, name)):
+                if not os.path.islink(os.path.join(dir, name)):
+                    dirs.append(name)
+            else:
+                files.append(name)
+    return dirs, files
+
+def read_ignorefile(path):
+    """Read the globs in the ignore file at path, one per line"""
+    try:
+        lines = open(os.path.join(path, IGNOREFILE)).readlines()
+    except IOError:
+        return []
+    lines = [line.strip() for line in lines]
+    return [line for line in lines if line and not line.startswith('#')]
+
+def is_excluded(file, root, excludes):
+    """Match globs against the path relative to root and against the name"""
+    if not excludes:
+        return False
+    relpath = os.path.relpath(file, root)
+    name = os.path.basename(file)
+    for glob in excludes:
+        if fnmatch.fnmatch(relpath, glob) or fnmatch.fnmatch(name, glob):
+            return True
+    return False
+
+# the module classes that weave with the compiler package and the ast module
+BACKENDS = {
+    'compiler': ModuleCompiler,
+    'ast': astweaver.AstModule,
+}
+
+def weave_module(file, basepath, worklist, verbose=False, cache=None,
+                 stats=NULL_STATS, backend='compiler',
+                 invalidation=bytecode.TIMESTAMP, bootstrap=None):
+    """Transform a module and write its bytecode, return True if it was
+    instrumented"""
+    m = BACKENDS[backend](file, basepath=basepath, cache=cache, stats=stats)
+    if m.transform(worklist, bootstrap=bootstrap):
+        m.writepyc(verbose=verbose, invalidation=invalidation)
+        return True
+
+
+## Parallel weaving
+
+# state handed to each worker process once, at pool startup
+_worker = {}
+
+def _init_worker(state):
+    _worker.update(state)
+
+def _get_stats():
+    """Statistics are collected per task, and sent back with the result"""
+    if _worker['stats']:
+        return Stats()
+    return NULL_STATS
+
+def _find_names_worker(file):
+    stats = _get_stats()
+    try:
+        m = BACKENDS[_worker['backend']](file, cache=_worker['cache'],
+                                         stats=stats)
+        return (file, m.find_names(), None, getattr(stats, 'data', None))
+    except Exception:
+        return (file, None, traceback.format_exc(), None)
+    finally:
+        log.flush()
+
+def _weave_worker(file):
+    stats = _get_stats()
+    try:
+        woven = weave_module(file, _worker['basepath'], _worker['worklist'],
+                             verbose=_worker['verbose'], cache=_worker['cache'],
+                             stats=stats, backend=_worker['backend'],
+                             invalidation=_worker['invalidation'],
+                             bootstrap=_worker['bootstrap'])
+        return (file, woven, None, getattr(stats, 'data', None))
+    except Exception:
+        return (file, None, traceback.format_exc(), None)
+    finally:
+        log.flush()
+
+def report_failure(file, error):
+    logger.error("Failed to weave module %s:\n%s", file, error.rstrip())
+
+def find_names_parallel(files, jobs, cache=None, stats=NULL_STATS,
+                        backend='compiler'):
+    """Collect names from modules in a pool of worker processes, return the
+    names per module and the list of modules that failed"""
+    names = {}
+    failed = []
+    state = {'cache': cache, 'stats': bool(stats), 'backend': backend}
+    log.flush()     # or the workers inherit the buffer
+    pool = multiprocessing.Pool(jobs, _init_worker, (state, ))
+    try:
+        for (file, found, error, data) in pool.imap_unordered(_find_names_worker, files):
+            if data:
+                stats.merge(data)
+            if error:
+                report_failure(file, error)
+                failed.append(file)
+            else:
+                names[file] = frozenset(found)
+    finally:
+        pool.close()
+        pool.join()
+    return names, failed
+
+def weave_parallel(files, basepath, worklist, jobs, verbose=False, cache=None,
+                   stats=NULL_STATS, backend='compiler',
+                   invalidation=bytecode.TIMESTAMP, bootstrap=None):
+    """Weave modules in a pool of worker processes. The worklist, with its
+    module names already mangled, is passed to every worker when the pool
+    starts. Return the modules that were woven and the modules that
+    failed."""
+    woven = []
+    failed = []
+    state = {
+        'basepath': basepath,
+        'worklist': worklist,
+        'verbose': verbose,
+        'cache': cache,
+        'stats': bool(stats),
+        'backend': backend,
+        'invalidation': invalidation,
+        'bootstrap': bootstrap,
+    }
+    log.flush()     # or the workers inherit the buffer
+    pool = multiprocessing.Pool(jobs, _init_worker, (state, ))
+    try:
+        for (file, result, error, data) in pool.imap_unordered(_weave_worker, files):
+            if data:
+                stats.merge(data)
+            if error:
+                report_failure(file, error)
+                failed.append(file)
+            elif result:
+                woven.append(file)
+    finally:
+        pool.close()
+        pool.join()
+    return woven, failed
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
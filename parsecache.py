@@ -0,0 +1,102 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""A cache of parse trees on disk, so that modules whose source has not
+changed need not be parsed (and checked) again. Trees are pickled under a key
+made from the path and the contents of the source file, the version of the
+cache format and the version of python, since the trees are those of the
+running compiler package. The cache is bounded
+in size, when it grows too large the least recently used trees are evicted."""
+
+import cPickle as pickle
+import hashlib
+import os
+import sys
+
+import filepath
+
+
+class ParseCache(object):
+    DIRNAME = '__aopycache__'
+    SUFFIX = '.tree'
+    LIMIT = 64 * 1024 * 1024
+    VERSION = 1
+
+    def __init__(self, dir, limit=LIMIT):
+        self.dir = dir
+        self.limit = limit
+        self.size = None
+
+    @classmethod
+    def for_path(cls, path, limit=LIMIT):
+        """The cache for a tree lives in its root directory"""
+        if os.path.isfile(path):
+            path = os.path.dirname(path)
+        return cls(os.path.join(path, cls.DIRNAME), limit=limit)
+
+    def get_file(self, file, source):
+        key = hashlib.sha1('\0'.join((str(self.VERSION), sys.version, file,
+                                      source))).hexdigest()
+        return os.path.join(self.dir, key + self.SUFFIX)
+
+    def load(self, file, source):
+        """Return the cached tree for this source, or None. A cache file that
+        cannot be read back, whatever the error, is a miss."""
+        cachefile = self.get_file(file, source)
+        try:
+            tree = pickle.load(open(cachefile, 'rb'))
+        except Exception:
+            return None
+        try:
+            os.utime(cachefile, None)       # mark as recently used
+        except OSError:
+            pass
+        return tree
+
+    def store(self, file, source, tree):
+        """Store the tree, written to a temp file and renamed into place so
+        that concurrent readers never see a partial file"""
+        try:
+            data = pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)
+        except RuntimeError:
+            return                          # too deeply nested to pickle
+        try:
+            filepath.write_atomic(self.get_file(file, source), data)
+        except (IOError, OSError):
+            return
+        if self.size is not None:
+            self.size += len(data)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used trees until the cache is below its
+        limit. The size of the cache is only measured on first use, and then
+        tracked."""
+        if self.size is None:
+            self.size = sum([size for (_, size, _) in self.entries()])
+        if self.size <= self.limit:
+            return
+        for (mtime, size, cachefile) in sorted(self.entries()):
+            if self.size <= self.limit * 0.9:
+                break
+            try:
+                os.remove(cachefile)
+                self.size -= size
+            except OSError:
+                pass
+
+    def entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(self.SUFFIX):
+                cachefile = os.path.join(self.dir, name)
+                try:
+                    st = os.stat(cachefile)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, cachefile))
+        return entries
@@ -0,0 +1,144 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""Pointcut patterns are regular expressions matched against the start of a
+pathspec, like module:Class/func. A Matcher compiles a set of advices once, and
+indexes them on the literal prefix of their patterns. Looking up a pathspec
+then only considers the advices whose prefix the pathspec starts with, and
+only runs a regex for the patterns that are not plain strings."""
+
+import re
+
+
+METACHARS = '.^$*+?{}[]|()'
+QUANTIFIERS = '*?{'
+SPECIAL = re.compile(r'[.^$*+?{}\[\]|()\\]')
+
+
+def literal_prefix(pattern):
+    """Return the literal prefix of a pattern and whether the pattern is
+    nothing but that prefix
+
+    >>> literal_prefix('main:func')
+    ('main:func', True)
+    >>> literal_prefix('main:Obj/.*')
+    ('main:Obj/', False)
+    >>> literal_prefix('main:funcs?')
+    ('main:func', False)
+    >>> literal_prefix('^dir/main:f')
+    ('dir/main:f', True)
+    >>> literal_prefix(r'pkg\.mod:\w+')
+    ('pkg.mod:', False)
+    >>> literal_prefix('main:a|main:b')
+    ('', False)
+    """
+
+    if '|' in pattern:
+        return '', False
+
+    i = 0
+    if pattern.startswith('^'):
+        i = 1
+
+    # without escapes the prefix ends at the first special character
+    m = SPECIAL.search(pattern, i)
+    if not m:
+        return pattern[i:], True
+    if m.group() != '\\':
+        end = m.start()
+        if m.group() in QUANTIFIERS and end > i:
+            end -= 1
+        return pattern[i:end], False
+
+    chars = []
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            if i+1 >= len(pattern) or pattern[i+1].isalnum():
+                break
+            c = pattern[i+1]
+            i += 1
+        elif c in METACHARS:
+            break
+        i += 1
+        if i < len(pattern) and pattern[i] in QUANTIFIERS:
+            break
+        chars.append(c)
+    return ''.join(chars), i >= len(pattern)
+
+
+class Matcher(object):
+    """Match a pathspec against a set of advices in one lookup. Advices are
+    indexed by the literal prefix of their patterns, and the lookup probes
+    one prefix of the pathspec per distinct prefix length, so its cost does
+    not grow with the number of advices."""
+
+    def __init__(self, advices):
+        self.prefixes = {}
+        for (i, advice) in enumerate(advices):
+            (prefix, literal) = literal_prefix(advice.pattern)
+            regex = None
+            if not literal:
+                regex = re.compile(advice.pattern)
+            self.prefixes.setdefault(prefix, []).append((i, regex, advice))
+        self.lengths = sorted(set(map(len, self.prefixes)))
+
+        # a prefix that reaches past the module part pins down the module,
+        # a shorter one only constrains how its name starts
+        self.modules = set()
+        self.stems = set()
+        for prefix in self.prefixes:
+            if ':' in prefix:
+                self.modules.add(prefix.split(':', 1)[0])
+            else:
+                self.stems.add(prefix)
+        self.stem_lengths = sorted(set(map(len, self.stems)))
+
+    def match(self, pathspec, stats=None):
+        """Return all advices matching pathspec, in the order given. Every
+        advice considered is counted as an attempt in stats, if given."""
+        found = []
+        for length in self.lengths:
+            if length > len(pathspec):
+                break
+            for (i, regex, advice) in self.prefixes.get(pathspec[:length], ()):
+                hit = not regex or regex.match(pathspec)
+                if stats:
+                    stats.attempt(advice, hit)
+                if hit:
+                    found.append((i, advice))
+        found.sort()
+        return [advice for (i, advice) in found]
+
+    def matches_module(self, name):
+        """Whether any pattern could match a pathspec in the module name,
+        judging by the literal prefixes alone. Allows modules to be ruled out
+        without parsing them.
+
+        >>> class Advice(object):
+        ...     def __init__(self, pattern):
+        ...         self.pattern = pattern
+        >>> matcher = Matcher([Advice('dir/main:func'), Advice('lib.*:f')])
+        >>> matcher.matches_module('dir/main')
+        True
+        >>> matcher.matches_module('dir/mainx')
+        False
+        >>> matcher.matches_module('lib/util')
+        True
+        >>> matcher.matches_module('li')
+        False
+        """
+
+        if name in self.modules:
+            return True
+        for length in self.stem_lengths:
+            if length > len(name):
+                break
+            if name[:length] in self.stems:
+                return True
+        return False
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
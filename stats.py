@@ -0,0 +1,136 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+"""Statistics on where a weave spends its time: wall time per phase (parse,
+check, names, transform, compile, dump) and per module, the number of nodes
+walked, match attempts and hits per advice, and bytes written. The report is
+a plain dict, so that the statistics of worker processes can be merged and
+the whole written out as json."""
+
+import json
+import time
+
+
+class Timer(object):
+    def __init__(self, stats, phase, file):
+        self.stats = stats
+        self.phase = phase
+        self.file = file
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, *exc):
+        self.stats.add_time(self.phase, self.file, time.time() - self.start)
+
+
+class NullTimer(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+class Stats(object):
+    def __init__(self):
+        self.data = {'phases': {}, 'modules': {}, 'advices': {}}
+
+    def timer(self, phase, file=None):
+        return Timer(self, phase, file)
+
+    def add_time(self, phase, file, secs):
+        phases = self.data['phases']
+        phases[phase] = phases.get(phase, 0) + secs
+        if file:
+            self.count(file, phase, secs)
+
+    def count(self, file, key, n):
+        module = self.data['modules'].setdefault(file, {})
+        module[key] = module.get(key, 0) + n
+
+    def attempt(self, advice, hit):
+        """Record an attempt to match an advice, and whether it was a hit"""
+        key = '%s %s' % (advice.__class__.__name__, advice.pattern)
+        counts = self.data['advices'].setdefault(key, {'attempts': 0, 'hits': 0})
+        counts['attempts'] += 1
+        if hit:
+            counts['hits'] += 1
+
+    def merge(self, data):
+        """Merge the data of another Stats, like that of a worker process"""
+        for (phase, secs) in data['phases'].items():
+            self.add_time(phase, None, secs)
+        for (file, module) in data['modules'].items():
+            for (key, n) in module.items():
+                self.count(file, key, n)
+        for (key, counts) in data['advices'].items():
+            mine = self.data['advices'].setdefault(key, {'attempts': 0, 'hits': 0})
+            mine['attempts'] += counts['attempts']
+            mine['hits'] += counts['hits']
+
+    def report(self):
+        report = dict(self.data)
+        report['bytes'] = sum([module.get('bytes', 0)
+                               for module in self.data['modules'].values()])
+        report['nodes'] = sum([module.get('nodes', 0)
+                               for module in self.data['modules'].values()])
+        return report
+
+    def write(self, file):
+        json.dump(self.report(), open(file, 'w'), indent=1, sort_keys=True)
+
+    def summary(self, top=10):
+        """A short human readable account of the report"""
+        report = self.report()
+        lines = []
+        phases = sorted(report['phases'].items(), key=lambda item: -item[1])
+        for (phase, secs) in phases:
+            lines.append("%-10s %8.3fs" % (phase, secs))
+        lines.append("%-10s %8d" % ('nodes', report['nodes']))
+        lines.append("%-10s %8d" % ('bytes', report['bytes']))
+
+        def elapsed(module):
+            return sum([n for (k, n) in module.items()
+                        if k in report['phases'] and k != 'total'])
+        modules = sorted(report['modules'].items(), key=lambda item: -elapsed(item[1]))
+        if modules:
+            lines.append("slowest modules:")
+            for (file, module) in modules[:top]:
+                lines.append("  %8.3fs  %s" % (elapsed(module), file))
+
+        advices = sorted(report['advices'].items(),
+                         key=lambda item: -item[1]['attempts'])
+        if advices:
+            lines.append("advices (attempts/hits):")
+            for (key, counts) in advices[:top]:
+                lines.append("  %6d %6d  %s" %
+                             (counts['attempts'], counts['hits'], key))
+        return '\n'.join(lines) + '\n'
+
+
+class NullStats(object):
+    """Collects nothing, used when statistics are off"""
+    def timer(self, phase, file=None):
+        return NULL_TIMER
+
+    def add_time(self, phase, file, secs):
+        pass
+
+    def count(self, file, key, n):
+        pass
+
+    def attempt(self, advice, hit):
+        pass
+
+    def merge(self, data):
+        pass
+
+    def __nonzero__(self):
+        return False
+
+    __bool__ = __nonzero__
+
+
+NULL_TIMER = NullTimer()
+NULL_STATS = NullStats()
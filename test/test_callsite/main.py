@@ -0,0 +1,53 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import os
+
+class Database(object):
+    def execute(self, query):
+        return len(query)
+
+def build(*parts):
+    return os.path.join(*parts)
+
+def build_quietly(*parts):
+    return os.path.join(*parts)
+
+def shadow(myaspects):
+    # an argument named like the advice module, in the calling function
+    return os.path.join(myaspects, 'e')
+
+class Store(object):
+    def __init__(self):
+        self.db = Database()
+
+    def save(self, query):
+        return self.db.execute(query)
+
+class Point(object):
+    def __init__(self, x):
+        self.x = x
+
+    def double(self):
+        return self.x * 2
+
+print(build('a', 'b'))
+print(build_quietly('c', 'd'))
+print(shadow('f'))
+print(Store().save('insert'))
+print(Database().execute('select'))
+print(Point(3).double())
+
+
+### TESTSPEC ###
+"""
+Called join('a', 'b') -> a/b
+a/b
+c/d
+Called join('f', 'e') -> f/e
+f/e
+Called execute('insert',) -> 6
+6
+6
+7
+"""
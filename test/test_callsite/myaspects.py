@@ -0,0 +1,18 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def trace(func, *args, **kwargs):
+    result = func(*args, **kwargs)
+    print("Called %s%s -> %s" % (func.__name__, args, result))
+    return result
+
+def get_x(self):
+    return self._x
+
+def set_x(self, value):
+    self._x = value
+
+def inc(func):
+    def wrapper(*args):
+        return func(*args) + 1
+    return wrapper
@@ -0,0 +1,20 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../..')
+import aopy
+
+import myaspects
+
+aspect = aopy.Aspect()
+aspect.add_call('main:build->os\.path\.join', myaspects.trace)
+aspect.add_call('main:shadow->os\.path\.join', myaspects.trace)
+aspect.add_call('main:Store/.*->self\.db\.', myaspects.trace)
+
+# the calls the weaver injects itself are never intercepted
+aspect.add_call('main:Point.*->.*', myaspects.trace)
+aspect.add_property('main:Point/x', myaspects.get_x, myaspects.set_x)
+aspect.add_decorator('main:Point/double', myaspects.inc)
+
+__all__ = ['aspect']
@@ -0,0 +1,19 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+#import myaspects
+
+# woven once, however many times the advice is given
+#@myaspects.dec
+def func(x):
+    return x
+
+if __name__ == '__main__':
+    print(func(1))
+
+
+### TESTSPEC ###
+"""
+---- dec ---- func
+1
+"""
@@ -0,0 +1,8 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def dec(f):
+    def new_f(*a, **k):
+        print("---- dec ---- %s" % f.__name__)
+        return f(*a, **k)
+    return new_f
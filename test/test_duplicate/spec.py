@@ -0,0 +1,19 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../..')
+import aopy
+
+import myaspects
+
+
+aspect = aopy.Aspect()
+aspect.add_decorator('main:func', myaspects.dec)
+
+# the same advice again, repeated in another aspect
+other = aopy.Aspect()
+other.add_decorator('main:func', myaspects.dec)
+other.add_decorator('main:func', myaspects.dec)
+
+__all__ = ['aspect', 'other']
@@ -0,0 +1,66 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+AOPYC = os.path.abspath('../../aopyc')
+
+GOOD = '''
+try:
+    import broken
+except SyntaxError:
+    pass
+
+def func(x):
+    return x
+
+print(func(1))
+'''
+
+BROKEN = '''
+def func(x:
+    return x
+'''
+
+if __name__ == '__main__':
+    #  a tree with a module that does not parse, woven serially, in
+    #  parallel and by following the imports of the other module: the
+    #  failure is reported, the rest is woven, and aopyc exits with an error
+    dir = tempfile.mkdtemp(prefix='aopy_')
+    try:
+        good = os.path.join(dir, 'good.py')
+        broken = os.path.join(dir, 'broken.py')
+        open(good, 'w').write(GOOD)
+        open(broken, 'w').write(BROKEN)
+        for args in (['-j', '1', dir], ['-j', '2', dir], ['-f', good]):
+            popen = subprocess.Popen([sys.executable, AOPYC, '-q',
+                                      '-t', 'spec.py'] + args,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT)
+            output = popen.communicate()[0]
+            reported = ('Failed to weave module %s' % broken) in output
+            print("%s: exit %s, failure reported: %s" %
+                  (' '.join(args[:-1]), popen.returncode, reported))
+            sys.stdout.flush()
+            subprocess.check_call([sys.executable, 'good.pyc'], cwd=dir)
+            os.remove(os.path.join(dir, 'good.pyc'))
+    finally:
+        shutil.rmtree(dir)
+
+
+### TESTSPEC ###
+"""
+-j 1: exit 1, failure reported: True
+---- dec ---- func
+1
+-j 2: exit 1, failure reported: True
+---- dec ---- func
+1
+-f: exit 1, failure reported: True
+---- dec ---- func
+1
+"""
@@ -0,0 +1,15 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../..')
+import aopy
+
+import myaspects
+
+# matches the modules main writes to a temporary tree, not any in this dir
+aspect = aopy.Aspect()
+aspect.add_decorator('good:func', myaspects.dec)
+aspect.add_decorator('broken:func', myaspects.dec)
+
+__all__ = ['aspect']
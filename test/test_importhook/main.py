@@ -0,0 +1,27 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../..')
+import aopy
+
+import spec
+
+if __name__ == '__main__':
+    aopy.install(spec.aspect)
+
+    #  woven on import:
+    #  @myaspects.dec    (pkg/lib:func)
+    #  __metaclass__ = myaspects.Meta    (pkg/lib:Obj)
+    from pkg import lib
+    print(lib.func(1))
+    print(lib.Obj.__name__)
+
+
+### TESTSPEC ###
+"""
+---- meta ---- Obj
+---- dec ---- func
+1
+Obj
+"""
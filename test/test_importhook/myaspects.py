@@ -0,0 +1,13 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def dec(func):
+    def new_func(*args, **kwargs):
+        print("---- dec ---- %s" % func.__name__)
+        return func(*args, **kwargs)
+    return new_func
+
+class Meta(type):
+    def __new__(cls, name, bases, dct):
+        print("---- meta ---- %s" % name)
+        return type.__new__(cls, name, bases, dct)
@@ -0,0 +1,8 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def func(x):
+    return x
+
+class Obj(object):
+    pass
@@ -0,0 +1,15 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../..')
+import aopy
+
+import myaspects
+
+aspect = aopy.Aspect()
+aspect.add_decorator('pkg/lib:func', myaspects.dec)
+aspect.add_metaclass('pkg/lib:Obj', myaspects.Meta)
+
+# nothing to weave for the compiler, main weaves on import
+__all__ = []
@@ -0,0 +1,56 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import os
+import shutil
+import sys
+import tempfile
+sys.path.append('../..')
+import aopy
+
+import spec
+
+def load(x, **kwargs):
+    """Import pkg.lib through a new finder, call it and forget it again"""
+    finder = aopy.install(spec.aspect, **kwargs)
+    try:
+        from pkg import lib
+        print(lib.func(x))
+        print(lib.myaspects)
+    finally:
+        aopy.uninstall(finder)
+        del sys.modules['pkg.lib'], sys.modules['pkg']
+    return finder
+
+if __name__ == '__main__':
+    cache_dir = tempfile.mkdtemp()
+    try:
+        load(1, backend='ast')
+        load(2, cache_dir=cache_dir)
+        print(len(os.listdir(cache_dir)))
+
+        # a new finder reads the woven code back from the cache
+        finder = aopy.install(spec.aspect, cache_dir=cache_dir)
+        finder.weave = None
+        from pkg import lib
+        print(lib.func(3))
+    finally:
+        shutil.rmtree(cache_dir)
+
+    # the advice module is mangled for pkg/lib only, not for everyone
+    print(spec.aspect.worklist[0].object.module)
+
+
+### TESTSPEC ###
+"""
+---- dec ---- func
+1
+lib
+---- dec ---- func
+2
+lib
+1
+---- dec ---- func
+3
+myaspects
+"""
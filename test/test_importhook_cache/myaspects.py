@@ -0,0 +1,8 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def dec(func):
+    def new_func(*args, **kwargs):
+        print("---- dec ---- %s" % func.__name__)
+        return func(*args, **kwargs)
+    return new_func
@@ -0,0 +1,8 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+# clashes with the advice module, which is imported under another name
+myaspects = 'lib'
+
+def func(x):
+    return x
@@ -0,0 +1,9 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+LIMIT = 100
+
+def bounded(x):
+    """Inline advice from a module in a package"""
+    if x > LIMIT:
+        raise ValueError("too large: %s" % x)
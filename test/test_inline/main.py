@@ -0,0 +1,64 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+
+def add(x, y):
+    """Add two numbers"""
+    before = 'local'
+    return x + y
+
+def shadow(x):
+    # a local named like the advice module, whose globals the advice uses
+    myaspects = 3
+    return x + myaspects
+
+def double(x):
+    return 2 * x
+
+class Account(object):
+    def __init__(self):
+        self.balance = 0
+
+    def deposit(self, amount):
+        before = self.balance
+        self.balance = before + amount
+        return self.balance
+
+print("Function name: %s" % add.__name__)
+print("Function doc: %s" % add.__doc__)
+print(add(1, 2))
+try:
+    add(-1, 2)
+except ValueError:
+    print("Error: %s" % sys.exc_info()[1])
+
+print(shadow(7))
+
+print(double(4))
+try:
+    double(200)
+except ValueError:
+    print("Error: %s" % sys.exc_info()[1])
+
+account = Account()
+print(account.deposit(5))
+
+#  woven:
+#  count is called in a finally block, so also for add(-1, 2)
+print(sys.modules.get('myaspects') and sys.modules['myaspects'].calls)
+
+
+### TESTSPEC ###
+"""
+Function name: add
+Function doc: Add two numbers
+3
+Error: negative: -1
+10
+8
+Error: too large: 200
+Balance 0 -> 5
+5
+[1, -1, 7]
+"""
@@ -0,0 +1,17 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+calls = []
+
+def check(x, y):
+    """Runs at the start of the function, with its arguments"""
+    if x < 0:
+        raise ValueError("negative: %s" % x)
+
+def count(x):
+    calls.append(x)
+
+def audit(self, amount):
+    before = self.balance
+    proceed()
+    print("Balance %s -> %s" % (before, self.balance))
@@ -0,0 +1,18 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../..')
+import aopy
+
+import myaspects
+import aspects.checks
+
+aspect = aopy.Aspect()
+aspect.add_before('main:add', myaspects.check)
+aspect.add_after('main:add', myaspects.count)
+aspect.add_after('main:shadow', myaspects.count)
+aspect.add_around('main:Account/deposit', myaspects.audit)
+aspect.add_before('main:double', aspects.checks.bounded)
+
+__all__ = ['aspect']
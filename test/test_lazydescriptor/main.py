@@ -0,0 +1,38 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+class A(object):
+    #  woven: the decorator goes on top of the existing ones
+    @classmethod
+    def make(cls):
+        return cls()
+
+    @staticmethod
+    def check(x):
+        return x
+
+    @property
+    def size(self):
+        return 3
+
+    def meth(self):
+        return 'meth'
+
+a = A.make()
+print(a.__class__.__name__)
+print(A.check(2))
+print(a.size)
+print(a.meth())
+
+
+### TESTSPEC ###
+"""
+---- dec ---- classmethod
+---- dec ---- staticmethod
+---- dec ---- property
+A
+2
+3
+---- dec ---- meth
+meth
+"""
@@ -0,0 +1,13 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def dec(obj):
+    """Decorates the functions and descriptors it is given alike, leaving
+    descriptors as they are"""
+    if not hasattr(obj, '__call__'):
+        print("---- dec ---- %s" % obj.__class__.__name__)
+        return obj
+    def new_f(*args, **kwargs):
+        print("---- dec ---- %s" % obj.__name__)
+        return obj(*args, **kwargs)
+    return new_f
@@ -0,0 +1,14 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../..')
+import aopy
+
+import myaspects
+
+aspect = aopy.Aspect()
+aspect.add_decorator('main:A/(make|check|size)$', myaspects.dec)
+aspect.add_decorator('main:A/meth', myaspects.dec)
+
+__all__ = ['aspect']
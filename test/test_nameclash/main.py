@@ -1,10 +1,28 @@
 # Author: Martin Matusiak <numerodix@gmail.com>
 # Licensed under the GNU Public License, version 3.
 
+# module and class level bindings that clash with the advice module names
+main = "main module"
+
 def func():
     return 1
 
+class Obj(object):
+    main = "main class"
+
+    def meth(self):
+        return self.main
+
+# the decorator of inner is evaluated in the scope of outer
+def outer(main_, main__):
+    def inner():
+        return main_ + main__
+    return inner()
+
 print(func())
+print(Obj().meth())
+print(main)
+print(outer(2, 3))
 
 
 ### TESTSPEC ###
@@ -12,4 +30,9 @@ print(func())
 Cache this
 Log this
 1
+Log this
+main class
+main module
+Log this
+5
 """
@@ -13,5 +13,7 @@ aspect = aopy.Aspect()
 # invert order (here: inner->outer) because decorators are added from the top
 aspect.add_decorator('main:func', aspects.logger.main.dec)
 aspect.add_decorator('main:func', aspects.cache.main.dec)
+aspect.add_decorator('main:Obj/meth', aspects.logger.main.dec)
+aspect.add_decorator('main:outer/inner', aspects.logger.main.dec)
 
 __all__ = ['aspect']
@@ -0,0 +1,8 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def dec(f):
+    def new_f(*args, **kwargs):
+        print("---- dec ---- %s" % f.__name__)
+        return f(*args, **kwargs)
+    return new_f
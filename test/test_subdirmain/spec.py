@@ -0,0 +1,13 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../..')
+import aopy
+
+import myaspects
+
+aspect = aopy.Aspect()
+aspect.add_decorator('tools/tool:func', myaspects.dec)
+
+__all__ = ['aspect']
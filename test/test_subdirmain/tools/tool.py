@@ -0,0 +1,17 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def func(x):
+    return x
+
+if __name__ == '__main__':
+    #  the entry script is not at the root of the woven tree, where the
+    #  bootstrap module is, it is put on the path by the woven module
+    print(func(1))
+
+
+### TESTSPEC ###
+"""
+---- dec ---- func
+1
+"""
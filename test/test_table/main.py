@@ -0,0 +1,43 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+#import myaspects
+
+#@myaspects.dec
+def first():
+    return 1
+
+#@myaspects.dec
+def second():
+    return 2
+
+class Obj(object):
+    #__metaclass__ = myaspects.Meta
+
+    def __init__(self):
+        self.att = 3
+
+    #@myaspects.dec
+    def meth(self):
+        return self.att
+
+    #att = property(fget=myaspects._get, fset=myaspects._set)
+
+if __name__ == '__main__':
+    print(first())
+    print(second())
+    print(Obj().meth())
+
+
+### TESTSPEC ###
+"""
+---- Meta ---- Obj
+---- dec ---- first
+1
+---- dec ---- second
+2
+++ Setter sees 3
+---- dec ---- meth
+++ Getter sees 3
+3
+"""
@@ -0,0 +1,21 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def dec(f):
+    def new_f(*a, **k):
+        print("---- dec ---- %s" % f.__name__)
+        return f(*a, **k)
+    return new_f
+
+class Meta(type):
+    def __new__(cls, name, bases, dct):
+        print("---- Meta ---- %s" % name)
+        return type.__new__(cls, name, bases, dct)
+
+def _get(self):
+    print("++ Getter sees %s" % self._att)
+    return self._att
+
+def _set(self, value):
+    print("++ Setter sees %s" % value)
+    self._att = value
@@ -0,0 +1,16 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../..')
+import aopy
+
+import myaspects
+
+
+aspect = aopy.load_table('pointcuts.csv')
+
+bulk = aopy.Aspect()
+bulk.add_decorators(['main:first', 'main:second'], myaspects.dec)
+
+__all__ = ['aspect', 'bulk']
@@ -0,0 +1,8 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def deca(func):
+    def wrapper(*args, **kwargs):
+        print("deca")
+        return func(*args, **kwargs)
+    return wrapper
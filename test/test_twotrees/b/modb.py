@@ -0,0 +1,5 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+def fb():
+    print("fb")
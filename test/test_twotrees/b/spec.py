@@ -0,0 +1,13 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import sys
+sys.path.append('../../..')
+import aopy
+
+import aspb
+
+aspect = aopy.Aspect()
+aspect.add_decorator('modb:fb', aspb.decb)
+
+__all__ = ['aspect']
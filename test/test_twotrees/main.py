@@ -0,0 +1,50 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+import subprocess
+import sys
+sys.path.append('../..')
+import aopy
+
+if __name__ == '__main__':
+    #  each tree is woven with its own spec, so it has its own bootstrap:
+    #  @aspa.deca    (a/moda:fa)
+    #  @aspb.decb    (b/modb:fb)
+    for tree in ('a', 'b'):
+        subprocess.check_call([sys.executable, '../../../aopyc', '-q',
+                               '-t', 'spec.py', '.'], cwd=tree)
+    sys.path.extend(['a', 'b'])
+    import moda
+    import modb
+    moda.fa()
+    modb.fb()
+
+    #  and so is each import hook:
+    #  @aspa.deca    (modc:fc)
+    #  @aspb.decb    (modd:fd)
+    import aspa
+    import aspb
+    first = aopy.Aspect()
+    first.add_decorator('modc:fc', aspa.deca)
+    second = aopy.Aspect()
+    second.add_decorator('modd:fd', aspb.decb)
+    aopy.install(first)
+    aopy.install(second, lazy=True)
+    sys.path.extend(['c', 'd'])
+    import modc
+    import modd
+    modc.fc()
+    modd.fd()
+
+
+### TESTSPEC ###
+"""
+deca
+fa
+decb
+fb
+deca
+fc
+decb
+fd
+"""
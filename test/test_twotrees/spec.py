@@ -0,0 +1,5 @@
+# Author: Martin Matusiak <numerodix@gmail.com>
+# Licensed under the GNU Public License, version 3.
+
+# nothing to weave for the compiler, main weaves each tree with its own spec
+__all__ = []
@@ -4,84 +4,44 @@
 import compiler
 import compiler.ast as ast
 import compiler.consts as consts
+import __builtin__
+import copy
 import functools
-import re
-import sys
 
+from bootstrap import get_canonical_names
+from log import logger, TRACE
 import aspect
+import filepath
 
 
-def walkresumer(f):
-    @functools.wraps(f)
-    def new_f(self, node, *args):
-        f(self, node, *args)
-        self.resumewalk(node, *args)
-    return new_f
-
-class KeepWalkingMeta(type):
-    def __new__(cls, name, bases, dct):
-        for (k, v) in dct.items():
-            import re, types
-            if (type(v) == types.FunctionType and
-                re.match("visit[a-zA-Z]+", k)):
-                dct[k] = walkresumer(v)
-        return type.__new__(cls, name, bases, dct)
-
-class NullMeta(KeepWalkingMeta):
-    "Can only override meta with a subclass of the metaclass"
-    def __new__(cls, name, bases, dct):
-        return type.__new__(cls, name, bases, dct)
+BUILTINS = frozenset(dir(__builtin__))
 
 
 class AbstractVisitor(object):
-    'Metaclass adds call to self.resumewalk at the end of every visit* method'
-    __metaclass__ = KeepWalkingMeta
-    def resumewalk(self, node, *args):
-        'derive from compiler.visitor.ASTVisitor.default'
-        for child in node.getChildNodes():
-            self.visit(child, *args)
-
-
-class NameFinderVisitor(AbstractVisitor):
-    """Collect all the names/symbols in the tree that will be affected by
-    introducing new bindings in a source transformation"""
-    def __init__(self):
-        self.names = {}
-
-    def get_names(self):
-        return self.names.keys()
-
-    def visitAssName(self, node, *args):
-        self.names[node.name] = None
-
-    def visitClass(self, node, *args):
-        self.names[node.name] = None
-
-    def visitFrom(self, node, *args):
-        self.names[node.modname] = None
-        for name in node.names:
-            self.names[name] = None
-
-    def visitFunction(self, node, *args):
-        self.names[node.name] = None
-        for name in node.argnames:
-            self.names[name] = None
-
-    def visitImport(self, node, *args):
-        for (name, asname) in node.names:
-            self.names[name] = None
-            if asname:
-                self.names[asname] = None
-
-    def visitGlobal(self, node, *args):
-        for name in node.names:
-            self.names[name] = None
-
-    def visitKeyword(self, node, *args):
-        self.names[node.name] = None
-
-    def visitName(self, node, *args):
-        self.names[node.name] = None
+    """Walks a tree iteratively, visiting each node before its children. The
+    visit* method for a node, if any, may return a tuple of arguments to pass
+    on to the children of the node, otherwise they get the node's own."""
+    def walk(self, tree, *args):
+        """Walk the tree, return the number of nodes visited"""
+        dispatch = {}
+        stack = [(tree, args)]
+        count = 0
+        while stack:
+            count += 1
+            (node, args) = stack.pop()
+            cls = node.__class__
+            try:
+                meth = dispatch[cls]
+            except KeyError:
+                meth = getattr(self, 'visit' + cls.__name__, None)
+                dispatch[cls] = meth
+            if meth:
+                result = meth(node, *args)
+                if result is not None:
+                    args = result
+            children = node.getChildNodes()
+            stack.extend([(child, args) for child in reversed(children)])
+        return count
 
 
 class ImportFinderVisitor(AbstractVisitor):
@@ -97,53 +57,246 @@ class ImportFinderVisitor(AbstractVisitor):
             self.names[name] = None
 
     def visitFrom(self, node, *args):
-        self.names[node.modname] = None
+        """Relative imports are recorded with a leading dot per level. The
+        imported names may be submodules, so they are recorded too."""
+        modname = '.' * (node.level or 0) + node.modname
+        self.names[modname] = None
+        for (name, asname) in node.names:
+            if name != '*':
+                if node.modname:
+                    name = '.' + name
+                self.names[modname + name] = None
 
 
-class TransformerVisitor(AbstractVisitor):
-    """The transformer operates in two distinct phases. The transform phase
-    matches advice patterns against pathspecs and performs transformations
-    accordingly. However, these patterns are matched in the course of
-    traversing the tree, so there is no way of knowing in advance whether a
-    given module will match any of the advices. If it does not, it should not be
-    touched. Therefore, imports are injected in a second phase based on the
-    matches found in the transform phase."""
+class ClassIndex(object):
+    """Index the members of a class body in one pass: its methods, the names
+    that are made class or static methods, and the attributes assigned on
+    self in the instance methods (in order of appearance)."""
 
-    __metaclass__ = NullMeta    # define our own decorators
+    WRAPPERS = ('classmethod', 'staticmethod')
 
-    PHASE_TRANSFORM = 1
-    PHASE_POST = 2
+    def __init__(self, cls):
+        assert isinstance(cls, ast.Class)
+        self.methods = []
+        self.wrapped = set()
+        self.attributes = []
+
+        for node in cls.code.nodes:
+            if isinstance(node, ast.Function):
+                self.methods.append(node)
+                # decorator syntax
+                if node.decorators:
+                    for dec in node.decorators.nodes:
+                        if self.is_wrapper(dec):
+                            self.wrapped.add(node.name)
+            elif isinstance(node, ast.Assign):
+                # class attribute assignment
+                if (isinstance(node.expr, ast.CallFunc) and
+                    self.is_wrapper(node.expr.node)):
+                    for assname in node.nodes:
+                        if isinstance(assname, ast.AssName):
+                            self.wrapped.add(assname.name)
+
+        seen = set()
+        for f in self.methods:
+            if not self.is_instancemethod(f.name) or not f.argnames:
+                continue
+            self_name = f.argnames[0]
+            for ass in f.code.nodes:
+                if not isinstance(ass, ast.Assign):
+                    continue
+                for assattr in ass.nodes:
+                    if (isinstance(assattr, ast.AssAttr) and
+                        isinstance(assattr.expr, ast.Name) and
+                        assattr.expr.name == self_name and
+                        assattr.attrname not in seen):
+                        seen.add(assattr.attrname)
+                        self.attributes.append(assattr.attrname)
+
+    def is_wrapper(self, node):
+        return isinstance(node, ast.Name) and node.name in self.WRAPPERS
+
+    def is_instancemethod(self, f_name):
+        return f_name not in self.wrapped
+
+
+def flatten_argnames(argnames):
+    """The names of function arguments, with tuple arguments unpacked"""
+    names = []
+    for name in argnames:
+        if isinstance(name, tuple):
+            names.extend(flatten_argnames(name))
+        else:
+            names.append(name)
+    return names
+
+def iter_nodes(tree):
+    """All the nodes under tree, tree included"""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.getChildNodes())
+
+def get_dotted_name(node):
+    """The dotted name of a Name, or of a chain of Getattr on one, else
+    None"""
+    if isinstance(node, ast.Name):
+        return node.name
+    elif isinstance(node, ast.Getattr):
+        name = get_dotted_name(node.expr)
+        return name and name + '.' + node.attrname
+
+def rewrite(value, replace):
+    """Rewrite the nodes under value in place, and return it. replace is
+    called on every node, and returns the node to put in its place, or None
+    to keep the node and rewrite its children."""
+    if isinstance(value, ast.Node):
+        new = replace(value)
+        if new is not None:
+            return new
+        for (attr, child) in value.__dict__.items():
+            setattr(value, attr, rewrite(child, replace))
+        return value
+    elif isinstance(value, list):
+        return [rewrite(item, replace) for item in value]
+    elif isinstance(value, tuple):
+        return tuple([rewrite(item, replace) for item in value])
+    return value
+
+
+class InlineBody(object):
+    """The body of the function of an inline advice, parsed from the source
+    of its module, to be spliced into matched functions. Its arguments are
+    the arguments of a matched function by the same name. The names it binds
+    are renamed, so as not to clash with the locals of the function, and the
+    globals it uses are looked up on its module. An around advice is split
+    at its proceed() statement, the body of the function goes in between.
+
+    The body is inlined as is, so it cannot return, yield or define scopes
+    of its own."""
+
+    DISALLOWED = (ast.Return, ast.Yield, ast.Function, ast.Lambda, ast.Class,
+                  ast.Global, ast.Import, ast.From)
+
+    # source file of an advice module -> tree
+    trees = {}
+
+    def __init__(self, advice):
+        obj = advice.object
+        self.advice = advice
+        self.name = '%s.%s' % (obj.modulename, obj.objname)
+        self.prefix = '_aopy_%s_%s_' % (obj.modulename.replace('.', '_'),
+                                        obj.objname)
+
+        file = filepath.get_source_file(obj.file)
+        tree = self.trees.get(file)
+        if tree is None:
+            tree = self.trees[file] = compiler.parseFile(file)
+        funcs = [node for node in tree.node.nodes
+                 if isinstance(node, ast.Function) and node.name == obj.objname]
+        if not funcs:
+            raise ValueError("Inline advice %s is not a function defined at "
+                             "module level" % self.name)
+        func = funcs[-1]
+
+        self.argnames = flatten_argnames(func.argnames)
+        self.locals = set()
+        for node in iter_nodes(func.code):
+            if isinstance(node, self.DISALLOWED):
+                raise ValueError("Inline advice %s cannot contain %s" %
+                                 (self.name, node.__class__.__name__))
+            if isinstance(node, ast.AssName):
+                self.locals.add(node.name)
+        self.locals.difference_update(self.argnames)
+
+        self.before = list(func.code.nodes)
+        self.after = []
+        if isinstance(advice, aspect.AfterAdvice):
+            (self.before, self.after) = (self.after, self.before)
+        elif isinstance(advice, aspect.AroundAdvice):
+            proceeds = [i for (i, node) in enumerate(self.before)
+                        if self.is_proceed(node)]
+            if len(proceeds) != 1:
+                raise ValueError("Inline advice %s must have one proceed() "
+                                 "statement in its body" % self.name)
+            (i, ) = proceeds
+            (self.before, self.after) = (self.before[:i], self.before[i+1:])
+            for stmt in self.before + self.after:
+                for node in iter_nodes(stmt):
+                    if isinstance(node, ast.Name) and node.name == 'proceed':
+                        raise ValueError("Inline advice %s can only use "
+                                         "proceed() as a statement in its "
+                                         "body" % self.name)
+
+        self.globals = set()
+        for stmt in self.before + self.after:
+            for node in iter_nodes(stmt):
+                if (isinstance(node, ast.Name) and
+                    node.name not in self.locals and
+                    node.name not in self.argnames and
+                    node.name not in BUILTINS):
+                    self.globals.add(node.name)
+
+    def is_proceed(self, node):
+        return (isinstance(node, ast.Discard) and
+                isinstance(node.expr, ast.CallFunc) and
+                isinstance(node.expr.node, ast.Name) and
+                node.expr.node.name == 'proceed' and
+                not (node.expr.args or node.expr.star_args or
+                     node.expr.dstar_args))
+
+    def splice(self, func, module):
+        """Splice the advice into func, return the statements spliced in.
+        module is an expression for the advice's module, which the globals of
+        the advice are looked up on."""
+        argnames = set(flatten_argnames(func.argnames))
+        missing = [name for name in self.argnames if name not in argnames]
+        if missing:
+            raise ValueError("Inline advice %s takes arguments that %s does "
+                             "not have: %s" %
+                             (self.name, func.name, ', '.join(missing)))
+
+        def replace(node):
+            node.lineno = func.lineno
+            if isinstance(node, ast.AssName) and node.name in self.locals:
+                return ast.AssName(self.prefix + node.name, node.flags,
+                                   lineno=func.lineno)
+            elif isinstance(node, ast.Name):
+                if node.name in self.locals:
+                    return ast.Name(self.prefix + node.name, lineno=func.lineno)
+                elif node.name in self.globals:
+                    return ast.Getattr(copy.deepcopy(module), node.name,
+                                       lineno=func.lineno)
+                return node
+
+        before = rewrite(copy.deepcopy(self.before), replace)
+        after = rewrite(copy.deepcopy(self.after), replace)
+        stmts = list(func.code.nodes)
+        if after and stmts:
+            stmts = [ast.TryFinally(ast.Stmt(stmts), ast.Stmt(after),
+                                    lineno=func.lineno)]
+        elif after:
+            stmts = after
+        func.code = ast.Stmt(before + stmts)
+        return before + after
+
+
+def advances_pathspec(f):
+    """Advance the pathspec into the node and pass it to the visit* function,
+    as well as on to the children of the node."""
+    @functools.wraps(f)
+    def new_f(self, node, *args):
+        args, pathspec = self.args_append(args, node)
+        f(self, pathspec, node, *args)
+        return args
+    return new_f
 
-    def __init__(self, phase, localname, worklist, *a, **kw):
-        self.phase = phase
+class PathspecVisitor(AbstractVisitor):
+    """Track the pathspec (module:Class/func) of the named node being
+    visited, visit methods decorated with advances_pathspec receive it."""
+    def __init__(self, localname):
         self.pathspec = localname + ':'
-        self.worklist = worklist
-        self.matched_advices = aspect.Worklist()
-        AbstractVisitor.__init__(self, *a, **kw)
-
-
-    ## Decorators
-
-    def post_transform_walkresumer(f):
-        """Only dispatch call in post transform mode."""
-        @functools.wraps(f)
-        def new_f(self, node, *args):
-            if self.phase == self.PHASE_POST:
-                f(self, node, *args)
-            self.resumewalk(node, *args)
-        return new_f
-
-    def transform_walkresumer(f):
-        """Intercept calls to functions this decorator is applied to when in
-        post transform phase, thus omitting any transformation rules.
-        Otherwise, advance the pathspec and pass it to the visit* function."""
-        @functools.wraps(f)
-        def new_f(self, node, *args):
-            if self.phase == self.PHASE_TRANSFORM:
-                args, pathspec = self.args_append(args, node)
-                f(self, pathspec, node, *args)
-            self.resumewalk(node, *args)
-        return new_f
 
     def args_append(self, args, node):
         name = node.name
@@ -156,51 +309,149 @@ class TransformerVisitor(AbstractVisitor):
                 pathspec += name
         return (pathspec, ), pathspec
 
+    def get_callspec(self, node, args):
+        """The pathspec of a call site, as in module:func->callee, or None if
+        the callee has no dotted name"""
+        callee = get_dotted_name(node.node)
+        if callee:
+            pathspec = args and args[0] or self.pathspec
+            return pathspec + '->' + callee
+
+
+class JoinPointFinderVisitor(PathspecVisitor):
+    """Find all the join points in the tree: classes, functions, the
+    attributes of instances and call sites, as (kind, pathspec) pairs"""
+    def __init__(self, localname):
+        PathspecVisitor.__init__(self, localname)
+        self.joinpoints = []
+        self.calls = set()
+
+    def get_joinpoints(self):
+        return self.joinpoints
+
+    @advances_pathspec
+    def visitClass(self, pathspec, node, *args):
+        self.joinpoints.append(('class', pathspec))
+        for name in ClassIndex(node).attributes:
+            self.joinpoints.append(('attribute', pathspec + '/' + name))
+
+    @advances_pathspec
+    def visitFunction(self, pathspec, node, *args):
+        self.joinpoints.append(('function', pathspec))
+
+    def visitCallFunc(self, node, *args):
+        callspec = self.get_callspec(node, args)
+        if callspec and callspec not in self.calls:
+            self.calls.add(callspec)
+            self.joinpoints.append(('call', callspec))
+
+
+class TransformerVisitor(PathspecVisitor):
+    """The transformer matches advice patterns against pathspecs and performs
+    transformations accordingly, in a single walk of the tree. The patterns
+    are matched in the course of traversing the tree, so there is no way of
+    knowing in advance whether a given module will match any of the advices.
+    Therefore, the matched advices are recorded during the walk, and the
+    imports they need are injected into the module header at the end. Given
+    a bootstrap module, the advice modules (or in lazy mode, the helpers that
+    import them on first use) are imported from it, otherwise the module sets
+    up their paths and imports them itself."""
+
+    def __init__(self, localname, worklist, stats=None, bootstrap=None):
+        PathspecVisitor.__init__(self, localname)
+        self.worklist = worklist
+        self.bootstrap = bootstrap
+        self.helpers = set()
+        self.imported = set()
+        self.inlines = {}
+        self.injected = set()
+        self.matched_advices = []
+        self.stats = stats
+        self.nodes = 0
+        self.trace = logger.isEnabledFor(TRACE)
+
+    def transform(self, tree):
+        """Transform the module, return True if any advice matched"""
+        self.nodes = self.walk(tree)
+        if self.matched_advices:
+            matched = self.worklist.subset(self.matched_advices)
+            mods = matched.get_modules()
+            if self.bootstrap:
+                self.add_bootstrap_import(tree, mods)
+            else:
+                paths = matched.get_module_paths()
+                self.add_imports(tree, paths, mods)
+            return True
+
 
     ## Visit methods
 
-    def match(self, advice, pathspec):
-        if re.match(advice.pattern, pathspec):
-            sys.stderr.write("Pattern matched: %s on %s\n" % (advice.pattern, pathspec))
+    def match(self, cls, pathspec):
+        advices = self.worklist.match(cls, pathspec, stats=self.stats)
+        for advice in advices:
+            if self.trace:
+                logger.debug("Pattern matched: %s on %s", advice.pattern, pathspec)
             self.matched_advices.append(advice)
-            return True
-        sys.stderr.write("Pattern failed: %s on %s\n" % (advice.pattern, pathspec))
+        return advices
 
-    @transform_walkresumer
+    @advances_pathspec
     def visitClass(self, pathspec, node, *args):
-        for advice in self.worklist.get_metaclasses():
-            if self.match(advice, pathspec):
-                self.set_metaclass(node, advice)
-
-        # XXX inelegant, to put it mildly
-        for advice in self.worklist.get_properties():
-            for f in self.find_items_in_stmt(node, ast.Function):
-                if self.is_instancemethod(node, f.name) and len(f.argnames) > 0:
-                    self_name = f.argnames[0]
-                    for ass in self.find_items_in_stmt(f, ast.Assign):
-                        for assattr in ass:
-                            if isinstance(assattr, ast.AssAttr):
-                                pathspec += '/' + assattr.attrname
-                                if isinstance(assattr.expr, ast.Name):
-                                    if assattr.expr.name == self_name:
-                                        if self.match(advice, pathspec):
-                                            self.set_property(node, assattr.attrname, advice)
-
-    @transform_walkresumer
-    def visitFunction(self, pathspec, node, *args):
-        for advice in self.worklist.get_decorators():
-            if self.match(advice, pathspec):
-                self.add_decorator(node, advice)
+        for advice in self.match(aspect.MetaclassAdvice, pathspec):
+            self.set_metaclass(node, advice)
 
-    @post_transform_walkresumer
-    def visitModule(self, node, *args):
-        mods = self.worklist.get_modules()
-        paths = self.worklist.get_module_paths()
-        self.add_imports(node, paths, mods)
+        if not self.worklist.get_properties():
+            return
+        for name in ClassIndex(node).attributes:
+            attrspec = pathspec + '/' + name
+            for advice in self.match(aspect.PropertyAdvice, attrspec):
+                self.set_property(node, name, advice)
 
+    @advances_pathspec
+    def visitFunction(self, pathspec, node, *args):
+        for advice in self.match(aspect.InlineAdvice, pathspec):
+            self.add_inline(node, advice)
+        for advice in self.match(aspect.DecoratorAdvice, pathspec):
+            self.add_decorator(node, advice)
+
+    def visitCallFunc(self, node, *args):
+        if node in self.injected or not self.worklist.get_calls():
+            return
+        callspec = self.get_callspec(node, args)
+        if callspec:
+            for advice in self.match(aspect.CallAdvice, callspec):
+                self.intercept_call(node, advice)
 
     ## Mutation methods
 
+    def add_bootstrap_import(self, module, mods):
+        """from _aopy_bootstrap import canonical as mangled, ...
+
+        preceded, unless the bootstrap is in memory, by (binding no names):
+
+        if path not in __import__('sys').path:
+            __import__('sys').path.append(path)
+        """
+        assert isinstance(module, ast.Module)
+        imports = []
+        if self.bootstrap.lazy:
+            names = sorted(self.helpers)
+            (_, importer) = self.bootstrap.get_importer()
+            for (name, mangled) in sorted(self.imported):
+                call = ast.CallFunc(ast.Name(importer), [ast.Const(name)],
+                                    None, None)
+                assname = ast.AssName(mangled, consts.OP_ASSIGN)
+                imports.append(ast.Assign([assname], call))
+        else:
+            canon = get_canonical_names([name for (name, _) in
+                                         self.worklist.get_modules()])
+            names = [(canon[name], mangled) for (name, mangled) in sorted(mods)]
+        stmts = list(module.node.getChildNodes())
+        if names:
+            imports.insert(0, ast.From(self.bootstrap.name, names, 0))
+        if imports and self.bootstrap.path:
+            imports.insert(0, self.get_path_check(self.bootstrap.path))
+        module.node = ast.Stmt(imports + stmts)
+
     def add_imports(self, module, paths, mods):
         assert isinstance(module, ast.Module)
         body = module.node
@@ -237,23 +488,41 @@ class TransformerVisitor(AbstractVisitor):
         'Wraps decorator around existing (decs+func)'
         assert isinstance(func, ast.Function)
         assert isinstance(dec_advice, aspect.DecoratorAdvice)
-        module_node = self.get_getattr(dec_advice.object.module)
-        decorator = dec_advice.object.objname
-
-        dec = ast.Getattr(module_node, decorator)
+        dec = self.get_reference(dec_advice.object, 'decorator')
         func_decs = []
         if func.decorators:
             func_decs = list(func.decorators.getChildNodes())
         func_decs.insert(0, dec)
         func.decorators = ast.Decorators(func_decs)
 
+    def add_inline(self, func, inline_advice):
+        'Splices the advice into the body of func'
+        assert isinstance(func, ast.Function)
+        assert isinstance(inline_advice, aspect.InlineAdvice)
+        body = self.inlines.get(inline_advice)
+        if body is None:
+            body = self.inlines[inline_advice] = InlineBody(inline_advice)
+        obj = inline_advice.object
+        module = self.worklist.get_module_name(obj)
+        if body.globals and self.bootstrap and self.bootstrap.lazy:
+            # imported with the module, not on first use
+            self.helpers.add(self.bootstrap.get_importer())
+            self.imported.add((obj.modulename, module))
+        for st in body.splice(func, self.get_getattr(module)):
+            self.inject(st)
+
+    def intercept_call(self, call, call_advice):
+        'Calls the advice in place of the callee, passing it the callee'
+        assert isinstance(call, ast.CallFunc)
+        assert isinstance(call_advice, aspect.CallAdvice)
+        ref = self.get_reference(call_advice.object, 'function')
+        call.args = [call.node] + list(call.args)
+        call.node = ref
+
     def set_metaclass(self, cl, meta_advice):
         'Overrides existing metaclass if set'
         assert isinstance(cl, ast.Class)
         assert isinstance(meta_advice, aspect.MetaclassAdvice)
-        module_node = self.get_getattr(meta_advice.object.module)
-        metaclass = meta_advice.object.objname
-
         # kill existing metaclass
         stmts = list(cl.code.getChildNodes())
         for st in stmts:
@@ -265,7 +534,7 @@ class TransformerVisitor(AbstractVisitor):
                         stmts.remove(st)
 
         metakey = ast.AssName('__metaclass__', consts.OP_ASSIGN)
-        metaval = ast.Getattr(module_node, metaclass)
+        metaval = self.get_reference(meta_advice.object, 'metaclass')
         metast = ast.Assign([metakey], metaval)
         stmts.insert(0, metast)
         cl.code = ast.Stmt(stmts)
@@ -284,16 +553,14 @@ class TransformerVisitor(AbstractVisitor):
 
         pairs = []
         for f_label in ('fget', 'fset', 'fdel'):
-            f_name = getattr(getattr(advice, f_label), 'objname', None)
-            module = getattr(getattr(advice, f_label), 'module', None)
-            if f_name and module:
-                module_node = self.get_getattr(module)
-                n = ast.Getattr(module_node, f_name)
+            obj = getattr(advice, f_label)
+            if obj:
+                n = self.get_reference(obj, 'function')
                 pairs.append((ast.Keyword(f_label, n)))
 
         metakey = ast.AssName(name, consts.OP_ASSIGN)
         prop = ast.Name('property')
-        metaval = ast.CallFunc(prop, pairs)
+        metaval = self.inject(ast.CallFunc(prop, pairs))
         metast = ast.Assign([metakey], metaval)
         stmts.append(metast)
         cl.code = ast.Stmt(stmts)
@@ -301,6 +568,34 @@ class TransformerVisitor(AbstractVisitor):
 
     ## Construction methods
 
+    def inject(self, node):
+        """Record the calls in a node the weaver adds, which call advice
+        leaves alone, return the node"""
+        self.injected.update([sub for sub in iter_nodes(node)
+                              if isinstance(sub, ast.CallFunc)])
+        return node
+
+    def get_reference(self, obj, kind):
+        """A reference to an injected object through its module, or in lazy
+        mode, through the helper for its kind of reference"""
+        if self.bootstrap and self.bootstrap.lazy:
+            (helper, alias) = self.bootstrap.get_helper(kind)
+            self.helpers.add((helper, alias))
+            args = [ast.Const(obj.modulename), ast.Const(obj.objname)]
+            return self.inject(ast.CallFunc(ast.Name(alias), args, None, None))
+        module = self.worklist.get_module_name(obj)
+        return ast.Getattr(self.get_getattr(module), obj.objname)
+
+    def get_path_check(self, path):
+        def sys_path():
+            sys = ast.CallFunc(ast.Name('__import__'), [ast.Const('sys')],
+                               None, None)
+            return ast.Getattr(sys, 'path')
+        compare = ast.Compare(ast.Const(path), [('not in', sys_path())])
+        append = ast.CallFunc(ast.Getattr(sys_path(), 'append'),
+                              [ast.Const(path)], None, None)
+        return ast.If([(compare, ast.Stmt([ast.Discard(append)]))], None)
+
     def get_getattr(self, modulepath):
         assert isinstance(modulepath, str)
         items = modulepath.split('.')
@@ -308,41 +603,3 @@ class TransformerVisitor(AbstractVisitor):
             return ast.Name(items[0])
         else:
             return ast.Getattr(self.get_getattr('.'.join(items[:-1])), items[-1])
-
-    ## Querying methods
-
-    def is_instancemethod(self, cls, f_name):
-        assert isinstance(cls, ast.Class)
-        decs = ('classmethod', 'staticmethod')
-
-        # decorator syntax
-        for f in self.find_items_in_stmt(cls, ast.Function):
-            if f.name == f_name and f.decorators:
-                for dec in f.decorators:
-                    if isinstance(dec, ast.Name):
-                        if dec.name in decs:
-                            return False
-
-        # class attribute assignment
-        for ass in self.find_items_in_stmt(cls, ast.Assign):
-            assname, callfunc = None, None
-            for n in ass:
-                if isinstance(n, ast.AssName):
-                    assname = n
-                elif isinstance(n, ast.CallFunc):
-                    callfunc = n
-
-            if assname and callfunc:
-                if assname.name == f_name:
-                    callable_name = (n for n in callfunc).next()
-                    if callable_name.name in decs:
-                        return False
-
-        return True
-
-    def find_items_in_stmt(self, node, astnode):
-        for n in node.getChildNodes():
-            if isinstance(n, ast.Stmt):
-                for child in n.getChildNodes():
-                    if isinstance(child, astnode):
-                        yield child